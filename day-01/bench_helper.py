@@ -0,0 +1,74 @@
+"""
+Shared benchmark helpers for the day-NN bench scripts
+
+Every bench reports a list of {"name", "unit", "value"} records (lower is
+better), times with best_of(), and saves/compares runs in the same JSON shape:
+
+  {"environment": {...}, "results": [record, ...]}
+
+Each day folder keeps its own copy next to its bench, so benches import it
+without touching sys.path; keep the copies in sync.
+"""
+from __future__ import annotations
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+
+def record(name: str, unit: str, value: float) -> dict:
+    return {"name": name, "unit": unit, "value": value}
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """Best wall time in seconds of several runs of func()."""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def environment(cwd: str, **extra) -> dict:
+    """Run metadata: time, the git commit checked out in cwd, Python and platform, plus extra."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=cwd).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        **extra,
+    }
+
+
+def write_json(path: str, results, env: dict) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"environment": env, "results": results}, f, indent=2)
+        f.write('\n')
+
+
+def compare(results, baseline_path: str, threshold: float) -> int:
+    """Print new/old ratios; return the number of regressions beyond threshold."""
+    with open(baseline_path, encoding='utf-8') as f:
+        old = {r['name']: r for r in json.load(f)['results']}
+    regressions = 0
+    print(f"\n{'benchmark':<36} {'old':>10} {'new':>10} {'ratio':>7}")
+    for r in results:
+        base = old.get(r['name'])
+        if base is None or base['unit'] != r['unit'] or not base['value']:
+            continue
+        ratio = r['value'] / base['value']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{r['name']:<36} {base['value']:>10.2f} {r['value']:>10.2f} {ratio:>6.2f}x{flag}")
+    return regressions
@@ -0,0 +1,274 @@
+"""
+Day 01 — Temperature converter benchmark suite
+
+Usage:
+  python day-01/bench_temp_converter.py
+  python day-01/bench_temp_converter.py --quick --json bench.json
+  python day-01/bench_temp_converter.py --json new.json --compare old.json
+  python day-01/bench_temp_converter.py --scaling 8 --lines 2000000
+
+Runs offline and times every hot path of ``temp_converter``:
+
+- scalar ``convert()`` for every registered scale pair, plus the original
+  if-chain implementation (kept here verbatim as a reference) for C/F/K
+- the error path (raising and catching ``ConversionError``)
+- CLI start-up: ``main()`` in-process and a cold ``python temp_converter.py``
+- batch (``convert_many``), streaming (``convert_lines``), memory-mapped binary
+  (``convert_binary``), process-pool (``convert_file_parallel``) and server
+  (``ConverterClient``) modes
+
+Each result is a {"name", "unit", "value"} record; lower is better for every
+unit. --json writes them with environment metadata so runs from different
+commits can be compared with --compare.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from array import array
+
+import temp_converter as tc
+from bench_helper import best_of, compare, environment, record, write_json
+
+PAIRS = [('c', 'f'), ('f', 'c'), ('c', 'k'), ('k', 'c'), ('f', 'k'), ('k', 'f')]
+
+# Inputs that are valid on every source scale
+SAMPLE = {'c': 22.0, 'f': 80.0, 'k': 300.0, 'r': 540.0, 're': 20.0, 'de': 100.0}
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp_converter.py')
+
+
+def legacy_convert(value: float, from_scale: str, to_scale: str) -> float:
+    """The pre-dispatch-table convert(): helper functions behind an if-chain."""
+    fs = from_scale.lower()
+    ts = to_scale.lower()
+    if fs not in {"c", "f", "k"} or ts not in {"c", "f", "k"}:
+        raise tc.ConversionError("Invalid scale(s).")
+    if fs == ts:
+        return float(value)
+    if fs == 'k' and value < 0:
+        raise tc.ConversionError("Kelvin cannot be negative.")
+    if fs == 'c' and (value < -273.15):
+        raise tc.ConversionError("Celsius below -273.15 is physically invalid.")
+    if fs == 'f' and (value < -459.67):
+        raise tc.ConversionError("Fahrenheit below -459.67 is physically invalid.")
+    if fs == 'c' and ts == 'f':
+        return tc.c_to_f(value)
+    if fs == 'f' and ts == 'c':
+        return tc.f_to_c(value)
+    if fs == 'c' and ts == 'k':
+        return tc.c_to_k(value)
+    if fs == 'k' and ts == 'c':
+        return tc.k_to_c(value)
+    if fs == 'f' and ts == 'k':
+        return tc.f_to_k(value)
+    if fs == 'k' and ts == 'f':
+        return tc.k_to_f(value)
+    raise tc.ConversionError("Unsupported conversion path.")
+
+
+def per_call_ns(func, args, number: int) -> float:
+    timer = timeit.Timer('func(value, fs, ts)',
+                         globals={'func': func, 'value': args[0], 'fs': args[1], 'ts': args[2]})
+    best = min(timer.repeat(number=number, repeat=5))
+    return best / number * 1e9
+
+
+def bench_dispatch(number: int):
+    """Return (pair, if-chain ns, affine ns) for the original C/F/K pairs."""
+    rows = []
+    for fs, ts in PAIRS:
+        args = (SAMPLE[fs], fs, ts)
+        rows.append((f"{fs}->{ts}", per_call_ns(legacy_convert, args, number),
+                     per_call_ns(tc.convert, args, number)))
+    return rows
+
+
+def bench_scalar(number: int):
+    results = []
+    for pair, legacy, _ in bench_dispatch(number):
+        results.append(record(f"legacy_convert[{pair}]", "ns/call", legacy))
+    for fs in sorted(tc.VALID_SCALES):
+        for ts in sorted(tc.VALID_SCALES):
+            ns = per_call_ns(tc.convert, (SAMPLE[fs], fs, ts), number)
+            results.append(record(f"convert[{fs}->{ts}]", "ns/call", ns))
+    return results
+
+
+def bench_errors(number: int):
+    def invalid_value():
+        try:
+            tc.convert(-1.0, 'k', 'c')
+        except tc.ConversionError:
+            pass
+
+    def invalid_scale():
+        try:
+            tc.convert(1.0, 'x', 'c')
+        except tc.ConversionError:
+            pass
+
+    return [
+        record("error[below_absolute_zero]", "ns/call",
+               min(timeit.repeat(invalid_value, number=number, repeat=5)) / number * 1e9),
+        record("error[invalid_scale]", "ns/call",
+               min(timeit.repeat(invalid_scale, number=number, repeat=5)) / number * 1e9),
+    ]
+
+
+def bench_cli(runs: int):
+    def in_process():
+        with contextlib.redirect_stdout(io.StringIO()):
+            tc.main(['--to', 'f', '--c', '22'])
+
+    def cold_start():
+        subprocess.run([sys.executable, SCRIPT, '--to', 'f', '--c', '22'],
+                       check=True, capture_output=True)
+
+    number = runs * 20
+    return [
+        record("cli[main_in_process]", "us/call",
+               min(timeit.repeat(in_process, number=number, repeat=5)) / number * 1e6),
+        record("cli[cold_start]", "ms/call", best_of(cold_start, runs) * 1e3),
+    ]
+
+
+def bench_batch(size: int):
+    rng = random.Random(1)
+    values = [rng.uniform(-50.0, 50.0) for _ in range(size)]
+    buf = array('d', values)
+    out = array('d', bytes(8 * size))
+    results = [
+        record("batch[convert_many,list]", "ns/value",
+               best_of(lambda: tc.convert_many(values, 'c', 'f')) / size * 1e9),
+        record("batch[convert_many,array_out]", "ns/value",
+               best_of(lambda: tc.convert_many(buf, 'c', 'f', out=out)) / size * 1e9),
+    ]
+    np = tc._numpy()
+    if np is not None:
+        arr = np.asarray(values)
+        arr_out = np.empty_like(arr)
+        results.append(record("batch[convert_many,numpy_out]", "ns/value",
+                              best_of(lambda: tc.convert_many(arr, 'c', 'f', out=arr_out)) / size * 1e9))
+    return results
+
+
+def write_sample_file(path: str, lines: int, seed: int = 1) -> None:
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(lines):
+            f.write(f"{rng.uniform(-50.0, 50.0):.3f}\n")
+
+
+def bench_files(lines: int, tmp: str):
+    text_path = os.path.join(tmp, 'readings.txt')
+    write_sample_file(text_path, lines)
+    bin_path = os.path.join(tmp, 'readings.f64')
+    with open(text_path, encoding='utf-8') as src, open(bin_path, 'wb') as dst:
+        array('d', (float(line) for line in src)).tofile(dst)
+    out_path = os.path.join(tmp, 'out.f64')
+
+    def stream():
+        with open(text_path, encoding='utf-8') as src, open(os.devnull, 'w') as sink:
+            sink.writelines(tc.convert_lines(src, 'c', 'f'))
+
+    def parallel():
+        with open(os.devnull, 'w') as sink:
+            tc.convert_file_parallel(text_path, 'c', 'f', sink, workers=1)
+
+    return [
+        record("stream[convert_lines]", "ns/line", best_of(stream, 3) / lines * 1e9),
+        record("parallel[workers=1]", "ns/line", best_of(parallel, 3) / lines * 1e9),
+        record("binary[convert_binary]", "ns/value",
+               best_of(lambda: tc.convert_binary(bin_path, 'c', 'f', out_path), 3) / lines * 1e9),
+    ]
+
+
+def bench_server(number: int):
+    with tc.ConverterClient() as client:
+        client.convert(1.0, 'c', 'f')  # warm up
+        t0 = time.perf_counter()
+        for _ in range(number):
+            client.convert(22.0, 'c', 'f')
+        elapsed = time.perf_counter() - t0
+    return [record("server[round_trip,pipe]", "us/call", elapsed / number * 1e6)]
+
+
+def bench_workers(max_workers: int, lines: int):
+    """Return (workers, seconds, lines/sec) for 1..max_workers on one sample file."""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'readings.txt')
+        write_sample_file(path, lines)
+        for workers in range(1, max_workers + 1):
+            with open(os.devnull, 'w') as sink:
+                t0 = time.perf_counter()
+                tc.convert_file_parallel(path, 'c', 'f', sink, workers)
+                elapsed = time.perf_counter() - t0
+            rows.append((workers, elapsed, lines / elapsed))
+    return rows
+
+
+def run_suite(quick: bool = False):
+    number = 20_000 if quick else 200_000
+    size = 100_000 if quick else 1_000_000
+    lines = 50_000 if quick else 500_000
+    results = []
+    results += bench_scalar(number)
+    results += bench_errors(number // 4)
+    results += bench_cli(3 if quick else 10)
+    results += bench_batch(size)
+    with tempfile.TemporaryDirectory() as tmp:
+        results += bench_files(lines, tmp)
+    results += bench_server(2_000 if quick else 20_000)
+    return results
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Benchmark temp_converter hot paths.")
+    p.add_argument('--quick', action='store_true',
+                   help='Smaller sizes for a fast smoke run')
+    p.add_argument('--json', metavar='PATH',
+                   help='Write results and environment metadata as JSON')
+    p.add_argument('--compare', metavar='PATH',
+                   help='Compare against a previous --json run (exit 1 on regression)')
+    p.add_argument('--threshold', type=float, default=0.10,
+                   help='Slowdown ratio reported as a regression (default: 0.10)')
+    p.add_argument('--scaling', type=int, metavar='N',
+                   help='Also time --workers 1..N on a generated file')
+    p.add_argument('--lines', type=int, default=1_000_000,
+                   help='Lines in the generated file for --scaling (default: 1000000)')
+    args = p.parse_args(argv)
+
+    results = run_suite(args.quick)
+    print(f"{'benchmark':<36} {'value':>12} unit")
+    for r in results:
+        print(f"{r['name']:<36} {r['value']:>12.2f} {r['unit']}")
+
+    if args.scaling:
+        print(f"\n{'workers':>7} {'seconds':>8} {'lines/s':>12} {'speedup':>8}")
+        rows = bench_workers(args.scaling, args.lines)
+        base = rows[0][1]
+        for workers, elapsed, rate in rows:
+            print(f"{workers:>7} {elapsed:>8.2f} {rate:>12,.0f} {base / elapsed:>7.2f}x")
+            results.append(record(f"scaling[workers={workers}]", "s", elapsed))
+
+    if args.json:
+        numpy = tc._numpy()
+        write_json(args.json, results,
+                   environment(os.path.dirname(SCRIPT), numpy=numpy.__version__ if numpy is not None else None))
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
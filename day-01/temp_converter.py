@@ -5,14 +5,62 @@ Usage examples:
   python temp_converter.py --to f --c 22
   python temp_converter.py --to c --f 80
   python temp_converter.py --to k --c 25 --precision 3
+  python temp_converter.py --to de --from r --value 500
+  python temp_converter.py --to f --from c --input readings.txt
+  cat readings.csv | python temp_converter.py --to k --from c --stdin --column 2
+  python temp_converter.py --to k --from c --input dump.f32 --binary float32 --output out.f32
+  python temp_converter.py --to f --from c --input big.txt --workers 8
+  python temp_converter.py --serve [--socket /tmp/temp_converter.sock]
 
-The tool accepts *one* input scale flag (--c, --f, or --k) and converts to the
-scale specified by --to {c,f,k}. It validates inputs and supports configurable
-rounding precision.
+The tool accepts *one* input scale flag (--c, --f, or --k, or --value with
+--from for any registered scale) and converts to the scale specified by --to.
+It validates inputs and supports configurable rounding precision. Besides
+C/F/K, Rankine (r), Réaumur (re) and Delisle (de) are built in; new scales are
+added with register_scale().
+
+Streaming mode (--stdin or --input FILE, with --from) converts one value per
+line, or one CSV column with --column, line by line in constant memory. Bad
+lines are reported on stderr and skipped; the run continues. With --binary,
+--input is a flat file of native-endian floats that is memory-mapped and
+converted chunk by chunk into --output (or in place). --workers N splits a
+text --input into line-aligned byte ranges converted by a process pool, with
+output kept in input order.
+
+Server mode (--serve) keeps one process alive and answers JSON-lines requests
+such as {"value": 22, "from": "c", "to": "f"} over stdin/stdout or a Unix
+domain socket (--socket), avoiding interpreter start-up per conversion;
+ConverterClient is a minimal client for it.
+
+For bulk data, ``convert_many()`` converts a whole NumPy array (or any
+sequence/buffer of numbers) in a single vectorized pass.
 """
 from __future__ import annotations
 import argparse
+import functools
+import io
+import json
+import math
+import mmap
+import os
+import stat
 import sys
+from collections import deque
+from fractions import Fraction
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+# Modules only some modes need (numpy, sockets, subprocesses, process pools)
+# are imported where they are used: numpy alone would triple the start-up
+# time of a single conversion.
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """NumPy for vectorized batch conversion, or None if it is not installed."""
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - exercised only without numpy
+        return None
+    return numpy
 
 # --- Conversion helpers ---
 
@@ -34,61 +82,588 @@ def f_to_k(f: float) -> float:
 def k_to_f(k: float) -> float:
     return c_to_f(k_to_c(k))
 
-VALID_SCALES = {"c", "f", "k"}
+# --- Scale registry ---
+#
+# Every scale is declared once as an affine map to Kelvin (K = value * scale +
+# offset). Any conversion between two registered scales is then affine too, so
+# the composed (scale, offset) pair for every from/to combination is
+# precomputed in _AFFINE, together with the valid input range [lo, hi], and a
+# conversion is two comparisons and a single multiply-add.
+
+VALID_SCALES: Set[str] = set()
+
+# Absolute zero expressed in each scale, and the scales that count downwards
+# (for those, readings *above* absolute zero are invalid, e.g. Delisle)
+ABSOLUTE_ZERO: Dict[str, float] = {}
+_DECREASING: Set[str] = set()
+
+_SCALES: Dict[str, Tuple[Fraction, Fraction, str]] = {}
+_AFFINE: Dict[Tuple[str, str], Tuple[float, float, float, float]] = {}
+
+
+def _exact(x) -> Fraction:
+    # repr of a float is its shortest decimal form: 273.15 -> Fraction('273.15')
+    return Fraction(repr(x)) if isinstance(x, float) else Fraction(x)
+
+
+def register_scale(name: str, scale, offset, label: Optional[str] = None) -> None:
+    """Register a temperature scale by its affine map to Kelvin.
+
+    ``scale`` and ``offset`` may be ints, floats, Fractions or strings such as
+    ``'5/9'``; they are kept as exact fractions so composed coefficients are
+    correctly rounded. Re-registering a name replaces it.
+    """
+    key = name.lower()
+    a, b = _exact(scale), _exact(offset)
+    if a == 0:
+        raise ValueError("Scale factor must be non-zero.")
+    _SCALES[key] = (a, b, label or key.upper())
+    _rebuild_tables()
+
+
+def _rebuild_tables() -> None:
+    VALID_SCALES.clear()
+    VALID_SCALES.update(_SCALES)
+    ABSOLUTE_ZERO.clear()
+    _DECREASING.clear()
+    for key, (a, b, _) in _SCALES.items():
+        ABSOLUTE_ZERO[key] = float(-b / a)
+        if a < 0:
+            _DECREASING.add(key)
+
+    inf = float('inf')
+    affine = {}
+    for fs, (a1, b1, _) in _SCALES.items():
+        zero = ABSOLUTE_ZERO[fs]
+        lo, hi = (-inf, zero) if fs in _DECREASING else (zero, inf)
+        for ts, (a2, b2, _) in _SCALES.items():
+            if fs == ts:
+                # Same-scale conversions skip physical validation
+                affine[(fs, ts)] = (1.0, 0.0, -inf, inf)
+                continue
+            # x -> K = a1*x + b1 -> y = (K - b2) / a2
+            affine[(fs, ts)] = (float(a1 / a2), float((b1 - b2) / a2), lo, hi)
+    _AFFINE.clear()
+    _AFFINE.update(affine)
+
+
+def _physical_error(fs: str) -> str:
+    label = _SCALES[fs][2]
+    zero = ABSOLUTE_ZERO[fs]
+    if zero == 0 and fs not in _DECREASING:
+        return f"{label} cannot be negative."
+    side = 'above' if fs in _DECREASING else 'below'
+    return f"{label} {side} {zero:g} is physically invalid."
+
+
+register_scale('k', 1, 0, 'Kelvin')
+register_scale('c', 1, '273.15', 'Celsius')
+register_scale('f', '5/9', '45967/180', 'Fahrenheit')  # (F + 459.67) * 5/9
+register_scale('r', '5/9', 0, 'Rankine')
+register_scale('re', '5/4', '273.15', 'Réaumur')
+register_scale('de', '-2/3', '373.15', 'Delisle')
 
 class ConversionError(Exception):
     pass
 
 
+class PhysicalRangeError(ConversionError):
+    """Batch input contains readings beyond absolute zero.
+
+    ``indices`` lists the position of every offending reading.
+    """
+
+    def __init__(self, message: str, indices):
+        super().__init__(message)
+        self.indices = list(indices)
+
+
 def convert(value: float, from_scale: str, to_scale: str) -> float:
-    """Convert temperature between C/F/K.
+    """Convert temperature between any two registered scales.
 
     Raises ConversionError for invalid scales or physical impossibilities
     (e.g., Kelvin < 0).
     """
+    try:
+        scale, offset, lo, hi = _AFFINE[from_scale.lower(), to_scale.lower()]
+    except KeyError:
+        raise ConversionError(f"Invalid scale(s). Use one of: {sorted(VALID_SCALES)}") from None
+
+    # Physical validation: nothing is colder than absolute zero
+    if value < lo or value > hi:
+        raise ConversionError(_physical_error(from_scale.lower()))
+
+    return value * scale + offset
+
+
+def convert_many(values, from_scale: str, to_scale: str, out=None):
+    """Convert a batch of temperatures between two scales in one pass.
+
+    ``values`` may be a NumPy array (converted with vectorized ufuncs, no
+    Python-level loop) or any sequence/buffer of numbers. Scales are validated
+    once for the whole batch and absolute-zero checks are done as a mask:
+    offending readings raise PhysicalRangeError with their indices, and nothing
+    is written to ``out`` in that case.
+
+    Pass ``out`` (a NumPy array, list, ``array.array`` or writable memoryview of
+    the same length) to write the results there instead of allocating; ``out``
+    may be ``values`` itself for an in-place conversion. Returns ``out`` when
+    given, otherwise a new ndarray (NumPy input) or list.
+    """
     fs = from_scale.lower()
     ts = to_scale.lower()
-    if fs not in VALID_SCALES or ts not in VALID_SCALES:
-        raise ConversionError(f"Invalid scale(s). Use one of: {sorted(VALID_SCALES)}")
-    if fs == ts:
-        return float(value)
-
-    # Physical validation: Kelvin cannot be below absolute zero
-    if fs == 'k' and value < 0:
-        raise ConversionError("Kelvin cannot be negative.")
-    if fs == 'c' and (value < -273.15):
-        raise ConversionError("Celsius below -273.15 is physically invalid.")
-    if fs == 'f' and (value < -459.67):
-        raise ConversionError("Fahrenheit below -459.67 is physically invalid.")
-
-    if fs == 'c' and ts == 'f':
-        return c_to_f(value)
-    if fs == 'f' and ts == 'c':
-        return f_to_c(value)
-    if fs == 'c' and ts == 'k':
-        return c_to_k(value)
-    if fs == 'k' and ts == 'c':
-        return k_to_c(value)
-    if fs == 'f' and ts == 'k':
-        return f_to_k(value)
-    if fs == 'k' and ts == 'f':
-        return k_to_f(value)
-
-    # Should not reach here
-    raise ConversionError("Unsupported conversion path.")
+    try:
+        scale, offset, _, _ = _AFFINE[fs, ts]
+    except KeyError:
+        raise ConversionError(f"Invalid scale(s). Use one of: {sorted(VALID_SCALES)}") from None
+    # Same-scale conversions skip validation, mirroring convert()
+    floor = None if fs == ts else ABSOLUTE_ZERO[fs]
+    decreasing = fs in _DECREASING
+
+    if not hasattr(values, '__len__'):
+        values = list(values)
+    if not isinstance(values, (list, tuple)) and _numpy() is not None:
+        return _convert_ndarray(values, scale, offset, floor, decreasing, out)
+
+    if floor is not None:
+        if decreasing:
+            bad = [i for i, v in enumerate(values) if v > floor]
+        else:
+            bad = [i for i, v in enumerate(values) if v < floor]
+        if bad:
+            raise _range_error(bad, floor)
+    if out is None:
+        return [v * scale + offset for v in values]
+    if len(out) != len(values):
+        raise ValueError("'out' must have the same length as 'values'.")
+    for i, v in enumerate(values):
+        out[i] = v * scale + offset
+    return out
+
+
+def _convert_ndarray(values, scale, offset, floor, decreasing, out):
+    np = _numpy()
+    arr = np.asarray(values)
+    if arr.dtype.kind != 'f':
+        arr = arr.astype(np.float64)
+    if floor is not None:
+        bad = np.flatnonzero(arr > floor if decreasing else arr < floor)
+        if bad.size:
+            raise _range_error(bad.tolist(), floor)
+    if out is None:
+        return arr * scale + offset
+    if isinstance(out, np.ndarray):
+        target = out
+    else:
+        try:
+            target = np.asarray(memoryview(out))  # shares the caller's buffer
+        except TypeError:
+            # e.g. a plain list: compute, then copy back element-wise
+            if len(out) != arr.size:
+                raise ValueError("'out' must have the same length as 'values'.")
+            out[:] = (arr * scale + offset).tolist()
+            return out
+    if target.shape != arr.shape:
+        raise ValueError("'out' must have the same shape as 'values'.")
+    if target.dtype.kind != 'f':
+        raise ConversionError(f"'out' must hold floats, not {target.dtype}.")
+    np.multiply(arr, scale, out=target)
+    np.add(target, offset, out=target)
+    return out
+
+
+def _range_error(bad, floor):
+    return PhysicalRangeError(
+        f"{len(bad)} reading(s) beyond absolute zero ({floor:g}); "
+        f"first at index {bad[0]}.", bad)
+
+
+def convert_lines(lines: Iterable[str], from_scale: str, to_scale: str,
+                  precision: int = 2, column: Optional[int] = None,
+                  on_error: Optional[Callable[[int, str], None]] = None) -> Iterator[str]:
+    """Lazily convert text lines, yielding one output line per input line.
+
+    Each line holds a single value, or with ``column`` (1-based) a
+    comma-separated row whose column is replaced by the converted value.
+    Blank lines are skipped. A bad line calls ``on_error(lineno, message)`` and
+    is dropped; without ``on_error`` it raises ConversionError instead.
+    """
+    for lineno, line in enumerate(lines, 1):
+        raw = line.rstrip('\r\n')
+        if not raw.strip():
+            continue
+        fields = raw.split(',') if column is not None else [raw]
+        idx = column - 1 if column is not None else 0
+        try:
+            if idx >= len(fields):
+                raise ValueError(f"missing column {column}")
+            value = float(fields[idx])
+            fields[idx] = str(round(convert(value, from_scale, to_scale), precision))
+        except (ValueError, ConversionError) as e:
+            if on_error is None:
+                raise ConversionError(f"line {lineno}: {e}") from e
+            on_error(lineno, str(e))
+            continue
+        yield ','.join(fields) + '\n'
+
+
+BINARY_DTYPES = {"float32": "f", "float64": "d"}
+
+
+def convert_binary(src: str, from_scale: str, to_scale: str, dst: Optional[str] = None,
+                   dtype: str = 'float64', chunk_pages: int = 256) -> int:
+    """Convert a flat binary file of native-endian floats through memory maps.
+
+    ``src`` is mapped read-only and results are written to a mapping of ``dst``
+    (created or resized to match), or back into ``src`` when ``dst`` is None.
+    Work proceeds in chunks of ``chunk_pages`` pages, so only those pages need
+    to be resident and files larger than RAM convert fine. Returns the number of
+    values converted.
+
+    An out-of-range reading raises PhysicalRangeError with file-wide indices;
+    chunks before the offending one have already been written by then.
+    """
+    try:
+        code = BINARY_DTYPES[dtype]
+    except KeyError:
+        raise ValueError(f"Unsupported dtype {dtype!r}. Use one of: {sorted(BINARY_DTYPES)}") from None
+    itemsize = 4 if code == 'f' else 8
+    chunk = mmap.PAGESIZE * max(1, chunk_pages)
+    in_place = dst is None or (os.path.exists(dst) and os.path.samefile(src, dst))
+
+    with open(src, 'r+b' if in_place else 'rb') as fin:
+        size = os.fstat(fin.fileno()).st_size
+        if size % itemsize:
+            raise ConversionError(f"{src}: size {size} is not a multiple of {itemsize} ({dtype}).")
+        fout = None if in_place else open(dst, 'w+b')
+        try:
+            if fout is not None:
+                fout.truncate(size)
+            if size == 0:
+                return 0
+            src_map = mmap.mmap(fin.fileno(), 0,
+                                access=mmap.ACCESS_WRITE if in_place else mmap.ACCESS_READ)
+            dst_map = src_map if in_place else mmap.mmap(fout.fileno(), 0)
+            try:
+                if hasattr(src_map, 'madvise'):
+                    src_map.madvise(mmap.MADV_SEQUENTIAL)
+                for start in range(0, size, chunk):
+                    _convert_mapped_chunk(src_map, dst_map, start, min(start + chunk, size),
+                                          code, itemsize, from_scale, to_scale)
+            finally:
+                if dst_map is not src_map:
+                    dst_map.close()
+                src_map.close()
+        finally:
+            if fout is not None:
+                fout.close()
+    return size // itemsize
+
+
+def _convert_mapped_chunk(src_map, dst_map, start, end, code, itemsize, from_scale, to_scale):
+    bad = None
+    with memoryview(src_map) as src_mv, memoryview(dst_map) as dst_mv:
+        src_view = src_mv[start:end].cast(code)
+        dst_view = dst_mv[start:end].cast(code)
+        try:
+            convert_many(src_view, from_scale, to_scale, out=dst_view)
+        except PhysicalRangeError as e:
+            bad = [start // itemsize + i for i in e.indices]
+        finally:
+            # Views must be released before the maps can be closed
+            src_view.release()
+            dst_view.release()
+    if bad:
+        raise _range_error(bad, ABSOLUTE_ZERO[from_scale.lower()])
+
+
+def _line_aligned_ranges(path: str, chunk_bytes: int) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) byte ranges of about chunk_bytes that end on a newline."""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()  # move forward to the next line start
+            end = f.tell()
+            yield start, end
+            start = end
+
+
+def _convert_range(path: str, start: int, end: int, from_scale: str, to_scale: str,
+                   precision: int, column: Optional[int]):
+    # Runs in a worker process: returns (output text, [(lineno, message)], line count)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    errors = []
+    nlines = 0
+
+    def counted(lines):
+        # Count lines as convert_lines sees them (universal newlines, so a
+        # bare '\r' ends a line too), keeping file-wide numbers exact
+        nonlocal nlines
+        for line in lines:
+            nlines += 1
+            yield line
+
+    lines = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')
+    text = ''.join(convert_lines(counted(lines), from_scale, to_scale, precision, column,
+                                 lambda n, msg: errors.append((n, msg))))
+    return text, errors, nlines
+
+
+def _init_worker(scales: Dict[str, Tuple[Fraction, Fraction, str]]) -> None:
+    # Spawned workers start from the built-in scales; install the parent's
+    # registry so scales added with register_scale() work there too
+    _SCALES.clear()
+    _SCALES.update(scales)
+    _rebuild_tables()
+
+
+def convert_file_parallel(path: str, from_scale: str, to_scale: str, out, workers: int,
+                          precision: int = 2, column: Optional[int] = None,
+                          on_error: Optional[Callable[[int, str], None]] = None,
+                          chunk_bytes: int = 1 << 22) -> None:
+    """Convert a text file like convert_lines(), spread across worker processes.
+
+    The file is cut into ~chunk_bytes ranges aligned to line boundaries; each
+    worker reads and converts its own range. Results are written to ``out`` in
+    input order, and at most 2 * workers chunks are in flight so memory stays
+    bounded. ``on_error`` receives file-wide line numbers; without it the first
+    bad line raises ConversionError.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(dict(_SCALES),)) as pool:
+        pending = deque()
+        line_base = 0
+
+        def drain_one():
+            nonlocal line_base
+            text, errors, nlines = pending.popleft().result()
+            for lineno, message in errors:
+                if on_error is None:
+                    raise ConversionError(f"line {line_base + lineno}: {message}")
+                on_error(line_base + lineno, message)
+            out.write(text)
+            line_base += nlines
+
+        for start, end in _line_aligned_ranges(path, chunk_bytes):
+            pending.append(pool.submit(_convert_range, path, start, end,
+                                       from_scale, to_scale, precision, column))
+            if len(pending) >= 2 * workers:
+                drain_one()
+        while pending:
+            drain_one()
+
+
+def _run_stream(args) -> int:
+    errors = 0
+
+    def report(lineno: int, message: str) -> None:
+        nonlocal errors
+        errors += 1
+        print(f"Error: line {lineno}: {message}", file=sys.stderr)
+
+    if args.workers > 1:
+        convert_file_parallel(args.input, args.from_scale, args.to, sys.stdout,
+                              args.workers, args.precision, args.column, report)
+        sys.stdout.flush()
+        return 2 if errors else 0
+
+    src = sys.stdin if args.stdin else open(args.input, encoding='utf-8')
+    try:
+        sys.stdout.writelines(convert_lines(
+            src, args.from_scale, args.to, args.precision, args.column, report))
+    finally:
+        if src is not sys.stdin:
+            src.close()
+    sys.stdout.flush()
+    return 2 if errors else 0
+
+
+# --- Server mode ---
+
+def _finite(value, field: str) -> float:
+    """value as a float, or ValueError unless it is a finite JSON number."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"'{field}' must be a number")
+    if not math.isfinite(value):
+        raise ValueError(f"'{field}' must be finite")
+    return value
+
+
+def handle_request(line: str) -> str:
+    """Answer one JSON-lines request with one JSON response line.
+
+    Requests are ``{"value": v, "from": s, "to": t}`` or ``{"values": [...],
+    ...}`` for a batch, with optional ``"precision"`` and an ``"id"`` that is
+    echoed back. Responses carry ``"result"``/``"results"`` or ``"error"``.
+    """
+    resp = {}
+    try:
+        req = json.loads(line)
+        if not isinstance(req, dict):
+            raise ValueError("request must be a JSON object")
+        if 'id' in req:
+            resp['id'] = req['id']
+        precision = req.get('precision')
+        if precision is not None and (isinstance(precision, bool) or not isinstance(precision, int)):
+            raise ValueError("'precision' must be an integer")
+        if 'values' in req:
+            if not isinstance(req['values'], list):
+                raise ValueError("'values' must be a list of numbers")
+            values = [_finite(v, 'values') for v in req['values']]
+            results = [_finite(r, 'results') for r in convert_many(values, req['from'], req['to'])]
+            if precision is not None:
+                results = [round(r, precision) for r in results]
+            resp['results'] = results
+        else:
+            result = _finite(convert(_finite(req['value'], 'value'), req['from'], req['to']), 'result')
+            resp['result'] = result if precision is None else round(result, precision)
+    except PhysicalRangeError as e:
+        resp['error'] = str(e)
+        resp['indices'] = e.indices
+    except KeyError as e:
+        resp['error'] = f"missing field {e}"
+    except (ValueError, TypeError, AttributeError, ConversionError) as e:
+        resp['error'] = str(e)
+    return json.dumps(resp, allow_nan=False) + '\n'
+
+
+def serve_stream(infile, outfile) -> int:
+    """Serve requests line by line from infile until EOF."""
+    for line in infile:
+        if not line.strip():
+            continue
+        outfile.write(handle_request(line))
+        outfile.flush()
+    return 0
+
+
+def make_socket_server(path: str) -> 'socketserver.ThreadingUnixStreamServer':
+    """Bind a threaded Unix-socket server at path (a stale socket is replaced)."""
+    import socketserver
+
+    class _RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                if raw.strip():
+                    self.wfile.write(handle_request(raw.decode('utf-8')).encode('utf-8'))
+
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)
+    server = socketserver.ThreadingUnixStreamServer(path, _RequestHandler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_socket(path: str) -> int:
+    server = make_socket_server(path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+    return 0
+
+
+class ConverterClient:
+    """Minimal client for ``--serve``.
+
+    Connects to a server's Unix socket, or with no path spawns a private
+    ``temp_converter.py --serve`` subprocess and talks over its pipes.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None):
+        self._proc = None
+        self._sock = None
+        if socket_path:
+            import socket
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(socket_path)
+            self._r = self._sock.makefile('r', encoding='utf-8')
+            self._w = self._sock.makefile('w', encoding='utf-8')
+        else:
+            import subprocess
+            self._proc = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--serve'],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, encoding='utf-8')
+            self._r, self._w = self._proc.stdout, self._proc.stdin
+
+    def request(self, payload: Dict) -> Dict:
+        self._w.write(json.dumps(payload) + '\n')
+        self._w.flush()
+        line = self._r.readline()
+        if not line:
+            raise ConnectionError("conversion server closed the connection")
+        return json.loads(line)
+
+    def convert(self, value: float, from_scale: str, to_scale: str) -> float:
+        resp = self.request({'value': value, 'from': from_scale, 'to': to_scale})
+        if 'error' in resp:
+            raise ConversionError(resp['error'])
+        return resp['result']
+
+    def convert_many(self, values, from_scale: str, to_scale: str) -> list:
+        resp = self.request({'values': list(values), 'from': from_scale, 'to': to_scale})
+        if 'indices' in resp:
+            raise PhysicalRangeError(resp['error'], resp['indices'])
+        if 'error' in resp:
+            raise ConversionError(resp['error'])
+        return resp['results']
+
+    def close(self) -> None:
+        self._w.close()
+        self._r.close()
+        if self._sock is not None:
+            self._sock.close()
+        if self._proc is not None:
+            self._proc.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
-        description="Convert temperatures between Celsius, Fahrenheit, Kelvin.")
-    p.add_argument('--to', required=True, choices=['c','f','k'],
-                   help='Target scale: c, f, or k')
+        description="Convert temperatures between Celsius, Fahrenheit, Kelvin "
+                    "and other registered scales.")
+    scales = sorted(VALID_SCALES)
+    p.add_argument('--to', choices=scales,
+                   help=f"Target scale: {', '.join(scales)} (required except with --serve)")
 
     src = p.add_mutually_exclusive_group(required=True)
     src.add_argument('--c', type=float, help='Input in Celsius')
     src.add_argument('--f', type=float, help='Input in Fahrenheit')
     src.add_argument('--k', type=float, help='Input in Kelvin')
+    src.add_argument('--value', type=float,
+                     help='Input in the scale given by --from')
+    src.add_argument('--stdin', action='store_true',
+                     help='Stream values from stdin (requires --from)')
+    src.add_argument('--input', metavar='FILE',
+                     help='Stream values from FILE (requires --from)')
+    src.add_argument('--serve', action='store_true',
+                     help='Answer JSON-lines requests until EOF (stdin/stdout or --socket)')
 
+    p.add_argument('--from', dest='from_scale', choices=scales,
+                   help='Input scale for --value/--stdin/--input')
+    p.add_argument('--column', type=int,
+                   help='Treat streamed lines as CSV and convert this 1-based column')
+    p.add_argument('--binary', choices=sorted(BINARY_DTYPES),
+                   help='Treat --input as flat binary floats of this type (memory-mapped)')
+    p.add_argument('--output', metavar='FILE',
+                   help='Output file for --binary (default: convert in place)')
+    p.add_argument('--socket', metavar='PATH',
+                   help='Serve on this Unix domain socket instead of stdin/stdout')
+    p.add_argument('--workers', type=int, default=1,
+                   help='Worker processes for a text --input (default: 1)')
     p.add_argument('--precision', type=int, default=2,
                    help='Decimal places for rounding (default: 2)')
     return p
@@ -98,11 +673,49 @@ def main(argv=None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
 
+    if args.serve:
+        if args.socket:
+            return serve_socket(args.socket)
+        return serve_stream(sys.stdin, sys.stdout)
+    if args.to is None:
+        parser.error('the following arguments are required: --to')
+
+    if args.from_scale is None and (args.stdin or args.input is not None
+                                    or args.value is not None):
+        parser.error('--from is required with --value/--stdin/--input')
+
+    if args.binary is not None:
+        if args.input is None:
+            parser.error('--binary requires --input')
+        try:
+            n = convert_binary(args.input, args.from_scale, args.to,
+                               args.output, args.binary)
+        except (ConversionError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        print(f"Converted {n} values -> {args.output or args.input}")
+        return 0
+
+    if args.stdin or args.input is not None:
+        if args.column is not None and args.column < 1:
+            parser.error('--column must be 1 or greater')
+        if args.workers < 1:
+            parser.error('--workers must be 1 or greater')
+        if args.workers > 1 and args.input is None:
+            parser.error('--workers requires --input')
+        try:
+            return _run_stream(args)
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
     # Determine input value and scale
     if args.c is not None:
         value, from_scale = args.c, 'c'
     elif args.f is not None:
         value, from_scale = args.f, 'f'
+    elif args.value is not None:
+        value, from_scale = args.value, args.from_scale
     else:
         value, from_scale = args.k, 'k'
 
@@ -59,3 +59,214 @@ def test_cli_samples():
 
     code, out, err = run_cli(['--to','k','--c','25','--precision','3'])
     assert code == 0 and out == '298.15'  # rounding to 3 keeps 298.150 -> 298.15
+
+
+def test_convert_many_matches_scalar():
+    values = [-40, 0, 22, 100]
+    for fs, ts in [('c', 'f'), ('f', 'c'), ('c', 'k'), ('k', 'c'), ('f', 'k'), ('k', 'f')]:
+        src = [v + 500 for v in values] if fs in 'kf' else values
+        got = mod.convert_many(src, fs, ts)
+        assert all(approx_equal(g, mod.convert(v, fs, ts)) for g, v in zip(got, src))
+
+
+def test_convert_many_reports_offending_indices():
+    import pytest
+    with pytest.raises(mod.PhysicalRangeError) as exc:
+        mod.convert_many([1, -1, 5, -3], 'k', 'c')
+    assert exc.value.indices == [1, 3]
+    assert isinstance(exc.value, mod.ConversionError)
+
+
+def test_convert_many_writes_into_out():
+    from array import array
+    src = array('d', [0.0, 100.0])
+    out = array('d', [0.0, 0.0])
+    assert mod.convert_many(src, 'c', 'f', out=out) is out
+    assert list(out) == [32.0, 212.0]
+
+
+def test_convert_many_numpy():
+    import pytest
+    np = pytest.importorskip('numpy')
+    arr = np.array([0.0, 100.0, -40.0])
+    out = np.empty_like(arr)
+    mod.convert_many(arr, 'c', 'f', out=out)
+    assert np.allclose(out, [32.0, 212.0, -40.0])
+    with pytest.raises(mod.PhysicalRangeError) as exc:
+        mod.convert_many(np.array([5.0, -500.0]), 'f', 'c')
+    assert exc.value.indices == [1]
+    with pytest.raises(mod.ConversionError):
+        mod.convert_many(arr, 'c', 'f', out=np.empty(3, dtype=np.int64))
+
+
+def test_cli_start_up_skips_heavy_imports():
+    code = ("import sys; sys.argv = ['t', '--to', 'f', '--c', '1']; sys.path.insert(0, 'day-01');"
+            "import temp_converter; temp_converter.main();"
+            "print(sorted({'numpy', 'socket', 'subprocess', 'concurrent.futures'} & set(sys.modules)))")
+    res = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    assert res.stdout.splitlines()[-1] == '[]'
+
+
+def test_convert_lines_skips_bad_lines():
+    errors = []
+    out = list(mod.convert_lines(['0\n', 'oops\n', '\n', '100\n'], 'c', 'f',
+                                 on_error=lambda n, msg: errors.append(n)))
+    assert out == ['32.0\n', '212.0\n']
+    assert errors == [2]
+
+
+def test_cli_stream_csv_input(tmp_path):
+    src = tmp_path / 'readings.csv'
+    src.write_text('s1,0\ns2,-500\ns3,100\n')
+    code, out, err = run_cli(['--to', 'k', '--from', 'c', '--input', str(src), '--column', '2'])
+    assert code == 2
+    assert out.splitlines() == ['s1,273.15', 's3,373.15']
+    assert 'line 2' in err
+
+
+def test_cli_stream_stdin():
+    cmd = [sys.executable, 'day-01/temp_converter.py', '--to', 'f', '--from', 'c', '--stdin']
+    res = subprocess.run(cmd, input='0\n37\n', capture_output=True, text=True)
+    assert res.returncode == 0 and res.stdout.split() == ['32.0', '98.6']
+
+
+def test_builtin_extra_scales():
+    assert approx_equal(mod.convert(0, 'c', 'r'), 491.67)
+    assert approx_equal(mod.convert(100, 'c', 're'), 80)
+    assert approx_equal(mod.convert(0, 'c', 'de'), 150)
+    assert approx_equal(mod.convert(491.67, 'r', 'f'), 32)
+
+
+def test_delisle_rejects_values_above_absolute_zero():
+    import pytest
+    with pytest.raises(mod.ConversionError):
+        mod.convert(600, 'de', 'c')
+    with pytest.raises(mod.PhysicalRangeError) as exc:
+        mod.convert_many([0, 600], 'de', 'k')
+    assert exc.value.indices == [1]
+
+
+def test_register_scale_adds_all_paths():
+    mod.register_scale('x', 2, 0, 'Double Kelvin')  # K = 2 * X
+    try:
+        assert approx_equal(mod.convert(10, 'x', 'k'), 20)
+        assert approx_equal(mod.convert(0, 'c', 'x'), 136.575)
+        assert 'x' in mod.VALID_SCALES
+    finally:
+        del mod._SCALES['x']
+        mod._rebuild_tables()
+
+
+def test_cli_value_with_from():
+    code, out, err = run_cli(['--to', 'c', '--from', 're', '--value', '80'])
+    assert code == 0 and out == '100.0'
+
+
+def test_convert_binary_to_output_and_in_place(tmp_path):
+    from array import array
+    src = tmp_path / 'raw.f64'
+    dst = tmp_path / 'out.f64'
+    src.write_bytes(array('d', [0.0, 100.0, -40.0] * 1000).tobytes())
+
+    assert mod.convert_binary(str(src), 'c', 'f', str(dst), chunk_pages=1) == 3000
+    out = array('d')
+    out.frombytes(dst.read_bytes())
+    assert list(out[:3]) == [32.0, 212.0, -40.0]
+
+    mod.convert_binary(str(src), 'c', 'k')
+    inplace = array('d')
+    inplace.frombytes(src.read_bytes())
+    assert approx_equal(inplace[1], 373.15)
+
+
+def test_convert_binary_reports_file_offsets(tmp_path):
+    import pytest
+    from array import array
+    src = tmp_path / 'raw.f32'
+    values = array('f', [1.0] * 5000)
+    values[4321] = -1.0
+    src.write_bytes(values.tobytes())
+    with pytest.raises(mod.PhysicalRangeError) as exc:
+        mod.convert_binary(str(src), 'k', 'c', str(tmp_path / 'out.f32'), dtype='float32', chunk_pages=1)
+    assert exc.value.indices == [4321]
+
+
+def test_convert_file_parallel_keeps_order(tmp_path, monkeypatch):
+    import io
+    # Workers unpickle _convert_range by module name
+    monkeypatch.setitem(sys.modules, 'temp_converter', mod)
+    monkeypatch.syspath_prepend('day-01')
+    src = tmp_path / 'readings.txt'
+    src.write_text(''.join(f'{i}\n' for i in range(2000)) + 'bad\n' + '5\n')
+    out = io.StringIO()
+    errors = []
+    mod.convert_file_parallel(str(src), 'c', 'k', out, workers=2, chunk_bytes=512,
+                              on_error=lambda n, msg: errors.append(n))
+    expected = [str(round(i + 273.15, 2)) for i in range(2000)] + ['278.15']
+    assert out.getvalue().split() == expected
+    assert errors == [2001]
+
+
+def test_convert_file_parallel_line_numbers_and_custom_scales(tmp_path, monkeypatch):
+    import io
+    monkeypatch.setitem(sys.modules, 'temp_converter', mod)
+    monkeypatch.syspath_prepend('day-01')
+    mod.register_scale('x2', '1/2', 0, 'Half-Kelvin')
+    try:
+        src = tmp_path / 'readings.txt'
+        # Bare '\r' line ends count as lines, as they do for convert_lines
+        src.write_bytes(b''.join(b'%d\n' % i for i in range(300)) + b'bad\r1\rbad\r\n'
+                        + b''.join(b'%d\n' % i for i in range(300)) + b'bad\n')
+        out = io.StringIO()
+        errors = []
+        mod.convert_file_parallel(str(src), 'k', 'x2', out, workers=2, chunk_bytes=256,
+                                  on_error=lambda n, msg: errors.append(n))
+        assert errors == [301, 303, 604]
+        assert out.getvalue().split()[:3] == ['0.0', '2.0', '4.0']
+    finally:
+        del mod._SCALES['x2']
+        mod._rebuild_tables()
+
+
+def test_cli_workers_matches_serial(tmp_path):
+    src = tmp_path / 'readings.txt'
+    src.write_text(''.join(f'{i / 7}\n' for i in range(3000)))
+    serial = run_cli(['--to', 'f', '--from', 'c', '--input', str(src)])
+    parallel = run_cli(['--to', 'f', '--from', 'c', '--input', str(src), '--workers', '3'])
+    assert serial == parallel and serial[0] == 0
+
+
+def test_handle_request():
+    import json
+    assert json.loads(mod.handle_request('{"value": 22, "from": "c", "to": "f", "id": 7}')) == {'id': 7, 'result': 71.6}
+    assert 'error' in json.loads(mod.handle_request('{"value": -1, "from": "k", "to": "c"}'))
+    assert json.loads(mod.handle_request('not json'))['error']
+    assert json.loads(mod.handle_request('{"value": "x", "from": "c", "to": "f"}')) == {'error': "'value' must be a number"}
+    assert json.loads(mod.handle_request('{"values": [1, true], "from": "c", "to": "f"}')) == {'error': "'values' must be a number"}
+    for line in ['{"value": 1e400, "from": "c", "to": "f"}', '{"value": NaN, "from": "c", "to": "f"}',
+                 '{"value": 1e308, "from": "c", "to": "f"}', '{"values": [1e308], "from": "c", "to": "f"}']:
+        out = mod.handle_request(line)
+        assert 'must be finite' in json.loads(out)['error'] and 'Infinity' not in out and 'NaN' not in out
+
+
+def test_client_over_spawned_server():
+    with mod.ConverterClient() as client:
+        assert approx_equal(client.convert(22, 'c', 'f'), 71.6)
+        assert client.convert_many([0, 100], 'c', 'k') == [273.15, 373.15]
+        import pytest
+        with pytest.raises(mod.ConversionError):
+            client.convert(-1, 'k', 'c')
+
+
+def test_client_over_unix_socket(tmp_path):
+    import threading
+    path = str(tmp_path / 'conv.sock')
+    server = mod.make_socket_server(path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with mod.ConverterClient(path) as client:
+            assert approx_equal(client.convert(80, 'f', 'c'), 26.6666667)
+    finally:
+        server.shutdown()
+        server.server_close()
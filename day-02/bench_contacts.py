@@ -0,0 +1,311 @@
+"""
+Day 02 — Contact book benchmarks
+
+Usage:
+  python day-02/bench_contacts.py
+  python day-02/bench_contacts.py --only scale --quick --json new.json --compare old.json
+  python day-02/bench_contacts.py --only memory --count 100000 --json bench.json
+  python day-02/bench_contacts.py --only serve --seconds 10 --clients 32
+  python day-02/bench_contacts.py --generate 100000 > contacts.jsonl
+
+Runs offline on generated contacts (--generate writes the same synthetic
+contacts as JSON lines, ready for ``contacts.py import``):
+
+- scale: load, save, add, find (hit and miss), delete and list through the
+  function API in ``contacts.py`` and through ``ContactBook`` in
+  ``contacts2.py``, on books of 10k, 100k and 1M contacts (--sizes); up to
+  100k also the ``find --index`` path (trigram index build, indexed finds)
+
+- memory: bytes per contact for a book loaded as plain dicts (the JSON
+  objects as json.load returns them) versus ``contacts.Contact`` records,
+  measured with tracemalloc
+- serve: a load generator against ``contacts2.py serve`` on a Unix socket;
+  concurrent clients send a find/list/add mix and the run reports requests
+  per second and p50/p99 latency
+
+Each result is a {"name", "unit", "value"} record; lower is better for every
+unit. --json writes them with environment metadata so runs from different
+commits can be compared with --compare.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Iterator
+
+import contacts
+from contacts import Contact
+from contacts2 import ContactBook
+from bench_helper import best_of, compare, environment, record, write_json
+
+SUITES = ['scale', 'memory', 'serve']
+SIZES = [10_000, 100_000, 1_000_000]
+# The trigram index takes ~3 kB per contact; larger books skip its timings
+INDEX_MAX = 100_000
+CONTACTS2 = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'contacts2.py')
+
+FIRST = ["Ada", "Alan", "Grace", "Linus", "Barbara", "Edsger", "Margaret", "Dennis",
+         "Frances", "Ken", "Radia", "Guido", "Katherine", "Donald", "Sophie", "Tim"]
+LAST = ["Lovelace", "Turing", "Hopper", "Torvalds", "Liskov", "Dijkstra", "Hamilton",
+        "Ritchie", "Allen", "Thompson", "Perlman", "van Rossum", "Johnson", "Knuth"]
+TAGS = ["work", "family", "friends", "sales", "apac", "emea", "vip", "vendor", "school", "gym"]
+
+
+def make_records(n: int, seed: int = 1) -> Iterator[Dict]:
+    """n contacts in the JSON shape, with realistic-looking names, phones and tags."""
+    rnd = random.Random(seed)
+    for cid in range(1, n + 1):
+        first, last = rnd.choice(FIRST), rnd.choice(LAST)
+        yield {
+            "id": cid,
+            "name": f"{first} {last}",
+            "phone": f"+1-{rnd.randrange(200, 999)}-{rnd.randrange(1000000, 9999999)}",
+            "email": f"{first.lower()}.{last.lower().replace(' ', '')}{cid}@example.com",
+            "tags": rnd.sample(TAGS, rnd.randrange(0, 4)),
+        }
+
+
+def _once(func) -> float:
+    t0 = time.perf_counter()
+    func()
+    return time.perf_counter() - t0
+
+
+def write_book(path: str, n: int) -> None:
+    """A contacts.py-format JSON book of n generated contacts (ContactBook reads it too)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"next_id": n + 1, "contacts": list(make_records(n))}, f, indent=2)
+
+
+def _scale_ops(prefix: str, n: int, ops: Dict, repeat: int, k: int):
+    """Time one API's ops; mutating ops run k times once, the rest best-of-repeat."""
+    out = []
+    for op in ('load', 'save', 'list', 'find_hit', 'find_miss'):
+        out.append(record(f"{prefix}.{op}[n={n}]", "ms", 1000 * best_of(ops[op], repeat)))
+    for op in ('add', 'delete'):
+        out.append(record(f"{prefix}.{op}[n={n}]", "us/op", 1e6 * _once(ops[op]) / k))
+    return out
+
+
+def bench_scale(n: int, tmp: str, repeat: int = 3):
+    """Load/save/list/find/add/delete through contacts.py and ContactBook on n contacts.
+
+    list is timed warm (after one call has built any lazy index). add and
+    delete only touch memory: ContactBook runs with autosave off so they are
+    comparable with the function API, where saving is a separate call.
+    """
+    path = os.path.join(tmp, f'book-{n}.json')
+    out_path = os.path.join(tmp, f'saved-{n}.json')
+    write_book(path, n)
+    k = min(1000, n)
+    hit = next(r for i, r in enumerate(make_records(n)) if i == n // 2)['email']
+    results = []
+
+    db = contacts.load_db(path)
+    contacts.list_contacts(db)
+
+    def fn_add():
+        for i in range(k):
+            contacts.add_contact(db, f"Bench {i}", f"+1-555-{i:07d}", f"bench{i}@example.com", ["bench"])
+
+    def fn_delete():
+        for cid in range(1, k + 1):
+            contacts.delete_contact(db, cid)
+
+    results += _scale_ops('contacts', n, {
+        'load': lambda: contacts.load_db(path),
+        'save': lambda: contacts.save_db(out_path, db),
+        'list': lambda: contacts.list_contacts(db),
+        'find_hit': lambda: contacts.find_contacts(db, hit),
+        'find_miss': lambda: contacts.find_contacts(db, 'no-such-contact'),
+        'add': fn_add,
+        'delete': fn_delete,
+    }, repeat, k)
+    if n <= INDEX_MAX:
+        # find --index: one index build per run, then each query from the index
+        results.append(record(f"contacts.index_build[n={n}]", "ms",
+                              1000 * best_of(lambda: contacts.build_search_index(db), repeat)))
+        results.append(record(f"contacts.find_hit_indexed[n={n}]", "ms",
+                              1000 * best_of(lambda: contacts.find_contacts(db, hit), repeat)))
+        results.append(record(f"contacts.find_miss_indexed[n={n}]", "ms",
+                              1000 * best_of(lambda: contacts.find_contacts(db, 'no-such-contact'), repeat)))
+    del db
+
+    book = ContactBook(path, autosave=False)
+    book.db_path = out_path
+
+    def book_add():
+        for i in range(k):
+            book.add_contact(f"Bench {i}", f"+1-555-{i:07d}", f"bench{i}@example.com", ["bench"])
+
+    def book_delete():
+        for cid in range(1, k + 1):
+            book.delete_contact(cid)
+
+    results += _scale_ops('ContactBook', n, {
+        'load': lambda: ContactBook(path),
+        'save': book.save_contacts,
+        'list': lambda: list(book.list_contacts('name')),
+        'find_hit': lambda: book.find_contacts(hit),
+        'find_miss': lambda: book.find_contacts('no-such-contact'),
+        'add': book_add,
+        'delete': book_delete,
+    }, repeat, k)
+    return results
+
+
+def _traced_bytes(build) -> int:
+    """Bytes still allocated by build()'s result once it returns."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        obj = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del obj
+    return size
+
+
+def bench_memory(n: int):
+    # Parse from JSON text so strings are fresh objects, as after load_db()
+    text = json.dumps(list(make_records(n)))
+    dict_bytes = _traced_bytes(lambda: json.loads(text))
+    slot_bytes = _traced_bytes(lambda: [Contact.from_dict(d) for d in json.loads(text)])
+    return [
+        record(f"memory[dict,n={n}]", "B/contact", dict_bytes / n),
+        record(f"memory[Contact,n={n}]", "B/contact", slot_bytes / n),
+    ]
+
+
+def _percentile(sorted_values, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def _client(path: str, n: int, deadline: float, seed: int, latencies: list) -> None:
+    # Broad finds ('5@') return ~100 kB lines, past asyncio's 64 kB default
+    reader, writer = await asyncio.open_unix_connection(path, limit=1 << 24)
+    rnd = random.Random(seed)
+    try:
+        while time.perf_counter() < deadline:
+            roll = rnd.random()
+            if roll < 0.8:
+                req = {"op": "find", "q": f"{rnd.randrange(1, n)}@"}
+            elif roll < 0.9:
+                req = {"op": "list", "sort_by": "name", "limit": 20}
+            else:
+                req = {"op": "add", "name": "Load Test", "phone": "+1-555-0100", "tags": ["load"]}
+            t0 = time.perf_counter()
+            writer.write((json.dumps(req) + '\n').encode('utf-8'))
+            await writer.drain()
+            line = await reader.readline()
+            latencies.append(time.perf_counter() - t0)
+            if 'error' in json.loads(line):
+                raise RuntimeError(line)
+    finally:
+        writer.close()
+
+
+def bench_serve(n: int, seconds: float, clients: int):
+    """Drive a `contacts2.py serve` process holding n contacts with concurrent clients."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'book.json')
+        with open(db, 'w', encoding='utf-8') as f:
+            json.dump({"contacts": list(make_records(n))}, f)
+        sock = os.path.join(tmp, 'book.sock')
+        proc = subprocess.Popen([sys.executable, CONTACTS2, '--db', db, 'serve', '--socket', sock],
+                                stdout=subprocess.PIPE, text=True)
+        try:
+            proc.stdout.readline()  # "Serving ..." once the socket is bound
+            latencies: list = []
+
+            async def run():
+                deadline = time.perf_counter() + seconds
+                await asyncio.gather(*(_client(sock, n, deadline, k, latencies) for k in range(clients)))
+
+            t0 = time.perf_counter()
+            asyncio.run(run())
+            elapsed = time.perf_counter() - t0
+        finally:
+            proc.terminate()
+            proc.wait()
+    latencies.sort()
+    return [
+        record(f"serve[n={n},clients={clients}]", "s/1k requests", 1000 * elapsed / len(latencies)),
+        record(f"serve_p50[n={n},clients={clients}]", "ms", 1000 * _percentile(latencies, 0.50)),
+        record(f"serve_p99[n={n},clients={clients}]", "ms", 1000 * _percentile(latencies, 0.99)),
+    ], len(latencies) / elapsed
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Benchmark the contact book.")
+    p.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                   help='Comma-separated book sizes for the scale suite (default: 10000,100000,1000000)')
+    p.add_argument('--quick', action='store_true',
+                   help='Scale suite at 10000 contacts only, single runs')
+    p.add_argument('--count', type=int, default=1_000_000,
+                   help='Contacts for the memory suite (default: 1000000)')
+    p.add_argument('--only', action='append', choices=SUITES,
+                   help='Run only this benchmark (repeatable; default: all)')
+    p.add_argument('--serve-count', type=int, default=10_000,
+                   help='Contacts in the served book (default: 10000)')
+    p.add_argument('--seconds', type=float, default=5.0,
+                   help='Duration of the serve load run (default: 5)')
+    p.add_argument('--clients', type=int, default=16,
+                   help='Concurrent serve clients (default: 16)')
+    p.add_argument('--generate', type=int, metavar='N',
+                   help='Write N synthetic contacts as JSON lines to stdout and exit')
+    p.add_argument('--json', metavar='PATH',
+                   help='Write results and environment metadata as JSON')
+    p.add_argument('--compare', metavar='PATH',
+                   help='Compare against a previous --json run (exit 1 on regression)')
+    p.add_argument('--threshold', type=float, default=0.10,
+                   help='Slowdown ratio reported as a regression (default: 0.10)')
+    args = p.parse_args(argv)
+    if args.generate is not None:
+        for rec in make_records(args.generate):
+            sys.stdout.write(json.dumps(rec) + '\n')
+        return 0
+    try:
+        sizes = [10_000] if args.quick else [int(x) for x in args.sizes.split(',')]
+    except ValueError:
+        print("Error: --sizes must be comma-separated integers.", file=sys.stderr)
+        return 2
+    if min(sizes + [args.count, args.serve_count, args.clients]) < 1:
+        print("Error: --sizes, --count, --serve-count and --clients must be positive.", file=sys.stderr)
+        return 2
+    suites = args.only or SUITES
+
+    results = []
+    if 'scale' in suites:
+        with tempfile.TemporaryDirectory() as tmp:
+            for n in sizes:
+                results += bench_scale(n, tmp, 1 if args.quick or n >= 1_000_000 else 3)
+    if 'memory' in suites:
+        results += bench_memory(args.count)
+    if 'serve' in suites:
+        serve_results, rps = bench_serve(args.serve_count, args.seconds, args.clients)
+        results += serve_results
+        print(f"serve: {rps:,.0f} requests/s")
+    print(f"{'benchmark':<36} {'value':>12} unit")
+    for r in results:
+        print(f"{r['name']:<36} {r['value']:>12.2f} {r['unit']}")
+
+    if args.json:
+        write_json(args.json, results, environment(os.path.dirname(CONTACTS2)))
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,122 +1,1785 @@
-B """
+"""
 Day 02 — Mini Contact Book (CLI)
 
 Features
 - In-memory CRUD with optional JSON persistence via --db <path>
-- Commands: add, list, find, delete
+- Commands: add, list, find, lookup, get, delete, import, export, dedupe, compact
+- Contacts are held in an id-keyed dict in memory (O(1) get/delete by id) and
+  saved as the usual JSON list
+- Each contact is a compact slotted Contact record (no per-record __dict__,
+  interned tags) that still supports dict-style access: c['name'], c.get(...)
+- Optional in-memory indexes (e.g. a trigram index for find) are kept in
+  db["_indexes"] and updated by add_contact/delete_contact
+- list walks sorted indexes by name and by id (built on first use, then kept
+  in order with bisect) instead of re-sorting the book on every call
+- Optional journal mode (--journal): mutations are appended to
+  <db>.journal as JSON lines instead of rewriting the whole file; load_db
+  replays the journal on top of the snapshot and `compact` folds it back in
+- lookup --phone matches national phone numbers (formatting, country code and
+  trunk prefix dropped) by prefix, suffix or exactly through sorted phone
+  indexes (O(log n + k) per lookup once built)
+- dedupe reports (or with --merge, merges) clusters of duplicate contacts
+  found through blocking keys in linear time
+- Optional binary snapshot format (`snapshot` command): a memory-mapped file
+  of length-prefixed records and a string table, auto-detected by its magic
+  header; records are decoded only when accessed. JSON stays the interchange
+  format (export/import)
+- Commands that save hold an fcntl lock on <db>.lock, so concurrent writers
+  never lose updates; with --shared, add/delete go through a group commit that
+  applies every pending mutation from concurrent processes in one atomic write
+  (crash-safe: the batch's results are saved with it)
+- Optional sharded layout (`shard` command): contacts hashed by id into N
+  JSON shard files behind a small manifest; shards load on demand (in
+  parallel with a process pool when the whole book is needed) and a save
+  rewrites only the shards that changed
+- Optional SQLite backend (--db sqlite:<path>): indexed table in WAL mode with
+  an FTS5 trigram index backing find; list/find read rows from a cursor
+- --stats prints per-phase timings, bytes read/written and record counts as
+  JSON on stderr (add_hook() exposes the same events to Python callers);
+  --profile writes a cProfile dump
 - Input validation and clear exit codes
 
 Exit codes
   0: success
-  1: not found (e.g., delete missing id)
+  1: not found (e.g., get/delete missing id)
   2: invalid input / usage error
 """
 from __future__ import annotations
 import argparse
+import bisect
+import csv
+import functools
+import heapq
+import inspect
+import io
+import itertools
 import json
+import mmap
+import os
+import re
+import sqlite3
+import struct
 import sys
+import tempfile
+import time
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+try:
+    import fcntl
+except ImportError:  # Windows: --shared is unavailable
+    fcntl = None
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple, Union
 
 DB_DEFAULT = {"next_id": 1, "contacts": []}
 
+SQLITE_PREFIX = 'sqlite:'
+
+# Commands that save the DB; they hold the <db>.lock file lock where fcntl exists
+WRITE_COMMANDS = ('add', 'delete', 'import', 'dedupe', 'compact', 'snapshot', 'shard')
+
+# ---------------- Contact record ----------------
+
+class Contact:
+    """One contact, stored compactly.
+
+    __slots__ drops the per-instance __dict__ and tags are kept as a tuple of
+    interned strings, so a tag shared by many contacts is stored once. Item
+    access (c['name'], c.get('email')) and keys() keep dict-based callers
+    working; to_dict()/from_dict() convert to and from the JSON format.
+    """
+
+    __slots__ = ('id', 'name', 'phone', 'email', 'tags')
+    FIELDS = __slots__
+
+    def __init__(self, id: Optional[int], name: str, phone: str, email: str = '',
+                 tags: Iterable[str] = ()):
+        self.id = id
+        self.name = name
+        self.phone = phone
+        self.email = email
+        self.tags = tuple(sys.intern(t) for t in tags)
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> 'Contact':
+        cid = d.get('id')
+        return cls(None if cid is None else int(cid), d.get('name', ''), d.get('phone', ''),
+                   d.get('email', ''), d.get('tags') or ())
+
+    def to_dict(self) -> Dict:
+        return {"id": self.id, "name": self.name, "phone": self.phone,
+                "email": self.email, "tags": list(self.tags)}
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.FIELDS
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.FIELDS
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Contact):
+            return (self.id, self.name, self.phone, self.email, self.tags) == \
+                   (other.id, other.name, other.phone, other.email, other.tags)
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None  # mutable, like the dicts it replaces
+
+    def __repr__(self) -> str:
+        return f"Contact({self.to_dict()!r})"
+
+# ---------------- Instrumentation ----------------
+
+# Hooks receive one event per instrumented call, e.g.
+#   {"phase": "load", "seconds": 0.42, "records": 10000, "bytes_read": 1932117}
+# With no hooks registered the wrappers return straight into the function.
+_HOOKS: List[Callable[[Dict], None]] = []
+_open_events: List[Dict] = []
+
+
+def add_hook(hook: Callable[[Dict], None]) -> Callable[[Dict], None]:
+    """Call hook(event) after every load/save/find/list/render/... phase."""
+    _HOOKS.append(hook)
+    return hook
+
+
+def remove_hook(hook: Callable[[Dict], None]) -> None:
+    _HOOKS.remove(hook)
+
+
+def _note(key: str, n: int) -> None:
+    # Add n to a counter of the innermost phase in progress, if any
+    if _open_events:
+        event = _open_events[-1]
+        event[key] = event.get(key, 0) + n
+
+
+def _emit(event: Dict, failed: bool = False) -> None:
+    # Every hook sees the event even if one raises. The first hook error is
+    # re-raised afterwards, unless the phase itself failed: its exception wins
+    error = None
+    for hook in list(_HOOKS):
+        try:
+            hook(event)
+        except Exception as e:
+            error = error or e
+    if error is not None and not failed:
+        raise error
+
+
+def _timed_iter(phase: str, it: Iterator) -> Iterator:
+    # Time only the steps spent inside the generator, so a consumer that is
+    # itself a phase (render) is not counted twice; report when it ends
+    event = {"phase": phase, "records": 0}
+    seconds = 0.0
+    failed = True
+    try:
+        while True:
+            _open_events.append(event)
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                break
+            finally:
+                seconds += time.perf_counter() - t0
+                _open_events.pop()
+            event["records"] += 1
+            yield item
+        failed = False
+    except GeneratorExit:
+        failed = False  # the consumer stopped early
+        raise
+    finally:
+        it.close()
+        event["seconds"] = seconds
+        _emit(event, failed)
+
+
+def _instrumented(phase: str, count: Optional[Callable] = None):
+    """Report each call as a phase event to the hooks; count(result) gives "records".
+
+    A generator function is reported once it is exhausted or closed, with the
+    number of items it yielded as "records".
+    """
+    def wrap(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen(*args, **kwargs):
+                it = fn(*args, **kwargs)
+                return _timed_iter(phase, it) if _HOOKS else it
+            return gen
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _HOOKS:
+                return fn(*args, **kwargs)
+            event = {"phase": phase}
+            _open_events.append(event)
+            t0 = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                if count is not None:
+                    event["records"] = count(result)
+                failed = False
+                return result
+            finally:
+                event["seconds"] = time.perf_counter() - t0
+                _open_events.pop()
+                _emit(event, failed)
+        return inner
+    return wrap
+
 # ---------------- Core functions ----------------
 
-def load_db(path: Optional[str]) -> Dict:
-    if not path:
-        # in-memory session only
-        return {"next_id": 1, "contacts": []}
-    p = Path(path)
-    if p.exists():
+def _contacts(db: Dict) -> MutableMapping:
+    """Return the id-keyed contact store, upgrading a plain JSON list in place.
+
+    Dicts keep insertion order, so iteration order matches the JSON list while
+    lookup and delete by id are O(1). Binary snapshots load as a
+    SnapshotContacts mapping, which behaves the same.
+    """
+    contacts = db["contacts"]
+    if isinstance(contacts, list):
+        contacts = {int(c['id']): Contact.from_dict(c) for c in contacts}
+        db["contacts"] = contacts
+        db.setdefault("next_id", max(contacts, default=0) + 1)
+    return contacts
+
+
+def _indexes(db: Dict) -> Iterable:
+    return db.get("_indexes", {}).values()
+
+
+@_instrumented("load", lambda db: len(db["contacts"]))
+def load_db(path: Optional[str], search_index: bool = False, journal: bool = False,
+            workers: Optional[int] = None) -> Dict:
+    """Load the DB from path (or start empty).
+
+    An existing <path>.journal is always replayed on top of the snapshot. With
+    journal=True, later add/delete calls are appended to it and save_db() only
+    syncs the journal. With search_index=True a TrigramIndex is built for
+    find_contacts(). workers caps the processes used to parse shards of a
+    sharded DB (default: automatic).
+    """
+    db = {"next_id": 1, "contacts": []}
+    if path:
+        p = Path(path)
+        if is_snapshot(p):
+            db = load_snapshot(path)
+        elif p.exists():
+            try:
+                raw = p.read_bytes()
+                _note("bytes_read", len(raw))
+                db = json.loads(raw)
+            except json.JSONDecodeError:
+                # Corrupt file → start fresh but don't overwrite yet
+                pass
+            if "shards" in db:
+                db = load_sharded(path, db, workers)
+    _contacts(db)
+    if path:
+        seq = _replay_journal(_journal_path(path), db)
+        if journal:
+            db["_journal"] = Journal(_journal_path(path), seq)
+    if search_index:
+        build_search_index(db)
+    return db
+
+
+# Read once at import: os.umask() can only be read by setting it, which is
+# not safe once other threads (ContactBook's save timer) may create files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _write_temp(p: Path, data: Union[str, bytes]) -> str:
+    # Write data to a temp file in p's directory and fsync it; return its path.
+    # mkstemp creates it 0600: give it p's mode, or what open() would for a
+    # new file, so a save does not make the DB owner-only
+    p.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=p.parent, prefix=p.name + '.', suffix='.tmp')
+    try:
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
         try:
-            return json.loads(p.read_text(encoding='utf-8'))
-        except json.JSONDecodeError:
-            # Corrupt file → start fresh but don't overwrite yet
-            return {"next_id": 1, "contacts": []}
-    else:
-        return {"next_id": 1, "contacts": []}
+            mode = os.stat(p).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        with os.fdopen(fd, 'wb') as f:
+            if hasattr(os, 'fchmod'):
+                os.fchmod(f.fileno(), mode)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        _note("bytes_written", len(data))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return tmp
+
 
+def _replace(tmp: str, p: Path) -> None:
+    # Rename a temp file from _write_temp() over p, or remove it on failure
+    try:
+        os.replace(tmp, p)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
 
+
+def _atomic_write(p: Path, data: Union[str, bytes]) -> None:
+    # Temp file + fsync + rename, so a crash never leaves a half-written file
+    _replace(_write_temp(p, data), p)
+
+
+def _write_snapshot(path: str, db: Dict) -> None:
+    _note("records", len(_contacts(db)))
+    if db.get("_sharded"):
+        write_shards(path, db)
+        return
+    if db.get("_binary"):
+        # Keep a binary DB binary
+        write_snapshot(path, db)
+        return
+    contacts = _contacts(db)
+    data = {"next_id": db["next_id"], "contacts": [c.to_dict() for c in contacts.values()]}
+    if db.get("journal_seq"):
+        data["journal_seq"] = db["journal_seq"]  # 0 (nothing folded) is the default
+    text = json.dumps(data, indent=2, ensure_ascii=False)
+    if isinstance(contacts, SnapshotContacts):
+        # Converting a binary DB: unmap it before the file is replaced
+        db["contacts"] = dict(contacts.items())
+        contacts.close()
+    _atomic_write(Path(path), text)
+
+
+@_instrumented("save")
 def save_db(path: Optional[str], db: Dict) -> None:
     if not path:
         return
-    p = Path(path)
-    p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(db, indent=2, ensure_ascii=False), encoding='utf-8')
+    journal = db.get("_journal")
+    if journal is not None:
+        # Mutations are already in the journal; just make them durable
+        journal.flush()
+        return
+    _write_snapshot(path, db)
 
 
-def add_contact(db: Dict, name: str, phone: str, email: Optional[str] = None, tags: Optional[List[str]] = None) -> Dict:
+def _make_contact(cid: Optional[int], name: str, phone: str, email: Optional[str] = None, tags: Optional[List[str]] = None) -> Contact:
     if not name or not phone:
         raise ValueError("'name' and 'phone' are required.")
-    tags = tags or []
+    return Contact(cid, name.strip(), phone.strip(), (email or '').strip(), tags or ())
+
+
+def add_contact(db: Dict, name: str, phone: str, email: Optional[str] = None, tags: Optional[List[str]] = None) -> Contact:
     cid = db["next_id"]
-    contact = {"id": cid, "name": name.strip(), "phone": phone.strip(), "email": (email or '').strip(), "tags": tags}
-    db["contacts"].append(contact)
+    contact = _make_contact(cid, name, phone, email, tags)
+    _contacts(db)[cid] = contact
     db["next_id"] = cid + 1
+    for ix in _indexes(db):
+        ix.add(contact)
+    if "_journal" in db:
+        db["_journal"].append({"op": "add", "contact": contact.to_dict()})
     return contact
 
 
-def list_contacts(db: Dict, sort_by: str = 'name', reverse: bool = False) -> List[Dict]:
-    valid = {"name", "id"}
-    key = sort_by if sort_by in valid else 'name'
-    return sorted(db["contacts"], key=lambda c: (c.get(key) or ''), reverse=reverse)
+@_instrumented("list", len)
+def list_contacts(db: Dict, sort_by: str = 'name', reverse: bool = False,
+                  limit: Optional[int] = None, offset: int = 0) -> List[Contact]:
+    """Return contacts in sort order, optionally one page of them.
+
+    Reads the page straight off the sorted index for sort_by, so a call costs
+    O(offset + limit) rather than a sort of the whole book. Equal names keep id
+    order in both directions, as a stable sorted() would.
+    """
+    key = sort_by if sort_by in {"name", "id"} else 'name'
+    stop = None if limit is None else offset + limit
+    return list(itertools.islice(sorted_index(db, key).walk(reverse), offset, stop))
 
 
-def find_contacts(db: Dict, query: str) -> List[Dict]:
+@_instrumented("find", len)
+def find_contacts(db: Dict, query: str) -> List[Contact]:
     q = (query or '').strip().lower()
     if not q:
         return []
+    contacts = _contacts(db)
+    ix = db.get("_indexes", {}).get("trigram")
+    if ix is not None:
+        return [contacts[cid] for cid in ix.search(q)]
     hits = []
-    for c in db["contacts"]:
-        hay = ' '.join([
-            str(c.get('name','')),
-            str(c.get('phone','')),
-            str(c.get('email','')),
-            ' '.join(c.get('tags', []))
-        ]).lower()
-        if q in hay:
+    for c in contacts.values():
+        if q in _haystack(c):
             hits.append(c)
     return hits
 
 
+def get_contact(db: Dict, cid: int) -> Optional[Contact]:
+    return _contacts(db).get(int(cid))
+
+
+def _put_contact(db: Dict, contact: Contact) -> None:
+    # Store a changed version of an existing contact; a journal "add" of an
+    # existing id replays as a replacement
+    contacts = _contacts(db)
+    old = contacts[contact.id]
+    contacts[contact.id] = contact
+    for ix in _indexes(db):
+        ix.replace(old, contact)
+    if "_journal" in db:
+        db["_journal"].append({"op": "add", "contact": contact.to_dict()})
+
+
 def delete_contact(db: Dict, cid: int) -> bool:
-    for i, c in enumerate(db["contacts"]):
-        if int(c.get('id')) == int(cid):
-            del db["contacts"][i]
-            return True
-    return False
+    c = _contacts(db).pop(int(cid), None)
+    if c is None:
+        return False
+    for ix in _indexes(db):
+        ix.remove(c)
+    if "_journal" in db:
+        db["_journal"].append({"op": "delete", "id": int(cid)})
+    return True
+
+# ---------------- Journal storage ----------------
+
+def _journal_path(path: str) -> str:
+    return path + '.journal'
+
+
+class Journal:
+    """Append-only JSON-lines log of add/delete records for one DB file.
+
+    Every record carries an increasing "seq"; the snapshot remembers the last
+    seq folded into it ("journal_seq") so replay skips records it already
+    contains. Appends are buffered and fsync'ed every ``sync_every`` records
+    and on flush().
+    """
+
+    def __init__(self, path: str, seq: int = 0, sync_every: int = 64):
+        self.path = path
+        self.seq = seq
+        self.sync_every = sync_every
+        self._f = None
+        self._unsynced = 0
+
+    def append(self, record: Dict) -> None:
+        self.seq += 1
+        if self._f is None:
+            self._f = open(self.path, 'a', encoding='utf-8')
+        line = json.dumps(dict(record, seq=self.seq), ensure_ascii=False) + '\n'
+        self._f.write(line)
+        if _open_events:
+            _note("bytes_written", len(line.encode('utf-8')))
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._f is not None and self._unsynced:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._unsynced = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def _replay_journal(jpath: str, db: Dict) -> int:
+    """Apply journal records newer than the snapshot; return the last seq seen.
+
+    A torn final line (crash mid-append) is cut off so later appends start on
+    a clean line.
+    """
+    seq = db.get("journal_seq", 0)
+    if not os.path.exists(jpath):
+        return seq
+    contacts = _contacts(db)
+    good = 0
+    with open(jpath, 'rb') as f:
+        for raw in f:
+            try:
+                rec = json.loads(raw)
+            except json.JSONDecodeError:
+                break
+            if not raw.endswith(b'\n'):
+                break
+            good += len(raw)
+            _note("bytes_read", len(raw))
+            if rec["seq"] <= seq:
+                continue
+            seq = rec["seq"]
+            if rec["op"] == "add":
+                c = Contact.from_dict(rec["contact"])
+                contacts[c.id] = c
+                db["next_id"] = max(db["next_id"], c.id + 1)
+            elif rec["op"] == "delete":
+                contacts.pop(int(rec["id"]), None)
+    if good < os.path.getsize(jpath):
+        os.truncate(jpath, good)
+    db["journal_seq"] = seq
+    return seq
+
+
+@_instrumented("compact", int)
+def compact_db(path: str, db: Dict) -> int:
+    """Fold the journal into a new snapshot; return the number of records folded.
+
+    The snapshot is written atomically (temp file + rename) with the journal's
+    last seq before the journal is truncated, so a crash in between is safe.
+    """
+    journal = db.get("_journal")
+    if journal is not None:
+        journal.close()
+        seq = journal.seq
+    else:
+        seq = db.get("journal_seq", 0)
+    jpath = _journal_path(path)
+    folded = 0
+    if os.path.exists(jpath):
+        with open(jpath, 'rb') as f:
+            folded = sum(1 for _ in f)
+    db["journal_seq"] = seq
+    _write_snapshot(path, db)
+    if os.path.exists(jpath):
+        os.truncate(jpath, 0)
+    return folded
+
+# ---------------- Binary snapshots ----------------
+
+# Layout (little-endian):
+#   header   magic, next_id, journal_seq (-1 = none), record count, string count,
+#            id index offset, string table offset
+#   records  per contact: u32 length, then id, name/phone/email string numbers,
+#            tag count and one string number per tag
+#   id index record ids sorted ascending (i64), then their record offsets (u64)
+#   strings  string count + 1 offsets (u64) into the UTF-8 blob that follows
+SNAPSHOT_MAGIC = b'CBOOK\x00\x01\n'
+_HEADER = struct.Struct('<8sQqQQQQ')
+_LEN = struct.Struct('<I')
+_LEN_ID = struct.Struct('<Iq')
+_REC = struct.Struct('<qIIIH')
+MAX_TAGS = 0xFFFF  # the record's tag count is a u16
+_SPAN = struct.Struct('<QQ')
+
+
+def is_snapshot(path: Union[str, Path]) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+    except OSError:
+        return False
+
+
+class SnapshotContacts(MutableMapping):
+    """Id-keyed contacts read lazily from a memory-mapped binary snapshot.
+
+    Opening the file only reads its header. A record is decoded on first access
+    (a binary search of the id index) and cached; iteration walks the records
+    in file order. Adds, replacements and deletes are held in memory on top of
+    the file until encode_snapshot() writes a new one. close() (or a with
+    block) unmaps the file.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _note("bytes_mapped", len(self.mm))
+        (magic, self.next_id, seq, self.count, self.nstrings,
+         index_off, self.strings_off) = _HEADER.unpack_from(self.mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Not a contact snapshot: {path}")
+        self.journal_seq = None if seq < 0 else seq
+        self._view = memoryview(self.mm)
+        self.ids = self._view[index_off:index_off + 8 * self.count].cast('q')
+        self.offsets = self._view[index_off + 8 * self.count:index_off + 16 * self.count].cast('Q')
+        self.blob_off = self.strings_off + 8 * (self.nstrings + 1)
+        self._cache: Dict[int, Contact] = {}
+        self._added: Dict[int, Contact] = {}
+        self.replaced: Set[int] = set()
+        self.deleted: Set[int] = set()
+
+    def close(self) -> None:
+        # The views into the map must be released before it can be closed
+        if not self.mm.closed:
+            self.ids.release()
+            self.offsets.release()
+            self._view.release()
+            self.mm.close()
+
+    def __enter__(self) -> 'SnapshotContacts':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _offset(self, cid: int) -> Optional[int]:
+        i = bisect.bisect_left(self.ids, cid)
+        if i < self.count and self.ids[i] == cid and cid not in self.deleted:
+            return self.offsets[i]
+        return None
+
+    def _string(self, i: int) -> str:
+        a, b = _SPAN.unpack_from(self.mm, self.strings_off + 8 * i)
+        return str(self.mm[self.blob_off + a:self.blob_off + b], 'utf-8')
+
+    def _decode(self, off: int) -> Contact:
+        cid, name, phone, email, ntags = _REC.unpack_from(self.mm, off + 4)
+        tags = struct.unpack_from(f'<{ntags}I', self.mm, off + 4 + _REC.size)
+        return Contact(cid, self._string(name), self._string(phone), self._string(email),
+                       [self._string(t) for t in tags])
+
+    def records(self) -> Iterator[Tuple[int, int, int]]:
+        """(id, offset, total length) of every live record in the file, in file order."""
+        pos = _HEADER.size
+        for _ in range(self.count):
+            n, cid = _LEN_ID.unpack_from(self.mm, pos)
+            if cid not in self.deleted:
+                yield cid, pos, 4 + n
+            pos += 4 + n
+
+    def __getitem__(self, cid: int) -> Contact:
+        c = self._added.get(cid) or self._cache.get(cid)
+        if c is not None:
+            return c
+        off = self._offset(cid)
+        if off is None:
+            raise KeyError(cid)
+        c = self._cache[cid] = self._decode(off)
+        return c
+
+    def __setitem__(self, cid: int, c: Contact) -> None:
+        # Re-adding a deleted id (a rolled-back delete) puts it back in place
+        self.deleted.discard(cid)
+        if self._offset(cid) is None:
+            self._added[cid] = c
+        else:
+            self._cache[cid] = c
+            self.replaced.add(cid)
+
+    def __delitem__(self, cid: int) -> None:
+        if cid in self._added:
+            del self._added[cid]
+            return
+        if self._offset(cid) is None:
+            raise KeyError(cid)
+        self.deleted.add(cid)
+        self._cache.pop(cid, None)
+        self.replaced.discard(cid)
+
+    def __contains__(self, cid: object) -> bool:
+        return cid in self._added or self._offset(cid) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        for cid, _, _ in self.records():
+            yield cid
+        yield from list(self._added)
+
+    def __len__(self) -> int:
+        return self.count - len(self.deleted) + len(self._added)
+
+    def added(self) -> Iterable[Contact]:
+        return self._added.values()
+
+
+def load_snapshot(path: str) -> Dict:
+    contacts = SnapshotContacts(path)
+    db = {"next_id": contacts.next_id, "contacts": contacts, "_binary": True}
+    if contacts.journal_seq is not None:
+        db["journal_seq"] = contacts.journal_seq
+    return db
+
+
+def encode_snapshot(db: Dict, reuse: bool = True) -> bytes:
+    """Serialize db in the binary snapshot format.
+
+    When db was loaded from a snapshot (and reuse is true), untouched records
+    and the old string table are copied as raw bytes, so saving after an add
+    or delete decodes nothing. Strings of deleted records stay in the table
+    until a full rewrite (reuse=False).
+    """
+    contacts = _contacts(db)
+    base = contacts if reuse and isinstance(contacts, SnapshotContacts) else None
+    nbase = base.nstrings if base is not None else 0
+    numbers: Dict[str, int] = {}
+    new_strings: List[bytes] = []
+
+    def ref(text: str) -> int:
+        i = numbers.get(text)
+        if i is None:
+            i = numbers[text] = nbase + len(new_strings)
+            new_strings.append(text.encode('utf-8'))
+        return i
+
+    def encode(c: Contact) -> bytes:
+        if len(c.tags) > MAX_TAGS:
+            raise ValueError(f"contact #{c.id} has {len(c.tags)} tags; a snapshot holds at most {MAX_TAGS}.")
+        tags = [ref(t) for t in c.tags]
+        body = (_REC.pack(c.id, ref(c.name or ''), ref(c.phone or ''), ref(c.email or ''), len(tags))
+                + struct.pack(f'<{len(tags)}I', *tags))
+        return _LEN.pack(len(body)) + body
+
+    chunks: List[bytes] = []
+    index: List[Tuple[int, int]] = []
+    pos = _HEADER.size
+    if base is not None:
+        for cid, off, n in base.records():
+            chunk = encode(base[cid]) if cid in base.replaced else base.mm[off:off + n]
+            chunks.append(chunk)
+            index.append((cid, pos))
+            pos += len(chunk)
+        rest = base.added()
+    else:
+        rest = contacts.values()
+    for c in rest:
+        chunk = encode(c)
+        chunks.append(chunk)
+        index.append((c.id, pos))
+        pos += len(chunk)
+    pad = -pos % 8
+    chunks.append(b'\0' * pad)
+    index_off = pos + pad
+    index.sort()
+    n = len(index)
+    chunks.append(struct.pack(f'<{n}q', *[cid for cid, _ in index]))
+    chunks.append(struct.pack(f'<{n}Q', *[off for _, off in index]))
+
+    strings_off = index_off + 16 * n
+    if base is not None:
+        chunks.append(base.mm[base.strings_off:base.blob_off])
+        end = struct.unpack_from('<Q', base.mm, base.strings_off + 8 * nbase)[0]
+        old_blob = base.mm[base.blob_off:base.blob_off + end]
+    else:
+        chunks.append(struct.pack('<Q', 0))
+        end, old_blob = 0, b''
+    ends = []
+    for b in new_strings:
+        end += len(b)
+        ends.append(end)
+    chunks.append(struct.pack(f'<{len(ends)}Q', *ends))
+    chunks.append(old_blob)
+    chunks.extend(new_strings)
+
+    seq = db.get("journal_seq")
+    header = _HEADER.pack(SNAPSHOT_MAGIC, db["next_id"], -1 if seq is None else seq, n,
+                          nbase + len(new_strings), index_off, strings_off)
+    return header + b''.join(chunks)
+
+
+def write_snapshot(path: str, db: Dict, reuse: bool = True) -> None:
+    """Atomically write db to path as a binary snapshot.
+
+    A db loaded from a snapshot is unmapped before the file is replaced and
+    then maps the new file, which holds all of its changes.
+    """
+    data = encode_snapshot(db, reuse)
+    contacts = _contacts(db)
+    if isinstance(contacts, SnapshotContacts):
+        contacts.close()
+    _atomic_write(Path(path), data)
+    if isinstance(contacts, SnapshotContacts):
+        db["contacts"] = SnapshotContacts(path)
+
+# ---------------- Sharded storage ----------------
+
+# A sharded DB file is a small JSON manifest:
+#   {"shards": N, "dir": "<name>.shards", "next_id": ..., "counts": [...]}
+# Contact c lives in <dir>/shard-NNNN.json for NNNN = c.id % N, stored as
+# {"contacts": [...]} in id order.
+PARALLEL_LOAD_BYTES = 32 * 1024 * 1024
+
+
+def _read_shard(path: str, size: int = 1) -> List[Tuple]:
+    # Runs in pool workers: parse one shard, return compact tuples to pickle back.
+    # Only a shard the manifest counts as empty may be missing; any other
+    # missing file is an incomplete write and must not read as an empty shard
+    try:
+        with open(path, 'rb') as f:
+            data = json.loads(f.read())
+    except FileNotFoundError:
+        if size == 0:
+            return []
+        raise
+    return [(int(c['id']), c.get('name', ''), c.get('phone', ''), c.get('email', ''), c.get('tags') or ())
+            for c in data['contacts']]
+
+
+class ShardedContacts(MutableMapping):
+    """Id-keyed contacts spread over shard files, each loaded on first use.
+
+    get/add/delete touch only the shard of the id. Iteration needs every
+    shard: they are parsed in parallel by a process pool when the unread
+    shards are large enough to repay it, then merged in id order. Shards
+    changed since loading are listed in ``dirty`` for write_shards().
+    """
+
+    def __init__(self, path: str, manifest: Dict, workers: Optional[int] = None):
+        self.count = int(manifest["shards"])
+        self.dir = os.path.join(os.path.dirname(path), manifest["dir"])
+        self.sizes = list(manifest.get("counts") or [0] * self.count)
+        self.shards: List[Optional[Dict[int, Contact]]] = [None] * self.count
+        self.dirty: Set[int] = set()
+        self.workers = workers
+
+    def shard_path(self, i: int) -> str:
+        return os.path.join(self.dir, f"shard-{i:04d}.json")
+
+    def _fill(self, i: int, rows: List[Tuple]) -> Dict[int, Contact]:
+        shard = self.shards[i] = {row[0]: Contact(*row) for row in rows}
+        return shard
+
+    def _shard(self, cid: int) -> Dict[int, Contact]:
+        i = int(cid) % self.count
+        shard = self.shards[i]
+        if shard is None:
+            path = self.shard_path(i)
+            if os.path.exists(path):
+                _note("bytes_read", os.path.getsize(path))
+            shard = self._fill(i, _read_shard(path, self.sizes[i]))
+        return shard
+
+    def load_all(self) -> None:
+        """Read every shard not loaded yet, in parallel when worthwhile."""
+        todo = [i for i, shard in enumerate(self.shards) if shard is None]
+        if not todo:
+            return
+        paths = [self.shard_path(i) for i in todo]
+        sizes = [self.sizes[i] for i in todo]
+        size = sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+        _note("bytes_read", size)
+        workers = self.workers
+        if workers is None:
+            workers = (os.cpu_count() or 1) if size >= PARALLEL_LOAD_BYTES else 1
+        workers = min(workers, len(todo))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for i, rows in zip(todo, pool.map(_read_shard, paths, sizes)):
+                    self._fill(i, rows)
+        else:
+            for i, path, n in zip(todo, paths, sizes):
+                self._fill(i, _read_shard(path, n))
+
+    def __getitem__(self, cid: int) -> Contact:
+        return self._shard(cid)[cid]
+
+    def __setitem__(self, cid: int, c: Contact) -> None:
+        self._shard(cid)[cid] = c
+        self.dirty.add(int(cid) % self.count)
+
+    def __delitem__(self, cid: int) -> None:
+        del self._shard(cid)[cid]
+        self.dirty.add(int(cid) % self.count)
+
+    def __contains__(self, cid: object) -> bool:
+        return isinstance(cid, int) and cid in self._shard(cid)
+
+    def __iter__(self) -> Iterator[int]:
+        self.load_all()
+        # Ids only grow, so every shard dict is already in id order
+        return heapq.merge(*self.shards)
+
+    def __len__(self) -> int:
+        # Unloaded shards are counted from the manifest
+        return sum(self.sizes[i] if shard is None else len(shard) for i, shard in enumerate(self.shards))
+
+
+def load_sharded(path: str, manifest: Dict, workers: Optional[int] = None) -> Dict:
+    db = {"next_id": manifest["next_id"], "contacts": ShardedContacts(path, manifest, workers),
+          "_sharded": True}
+    if "journal_seq" in manifest:
+        db["journal_seq"] = manifest["journal_seq"]
+    return db
+
+
+def _shard_manifest(db: Dict) -> Dict:
+    contacts = _contacts(db)
+    manifest = {"shards": contacts.count, "dir": os.path.basename(contacts.dir),
+                "next_id": db["next_id"], "counts": [0] * contacts.count}
+    for i, shard in enumerate(contacts.shards):
+        manifest["counts"][i] = contacts.sizes[i] if shard is None else len(shard)
+    if db.get("journal_seq"):
+        manifest["journal_seq"] = db["journal_seq"]
+    return manifest
+
+
+def _write_dirty_shards(contacts: ShardedContacts, counts: List[int]) -> None:
+    Path(contacts.dir).mkdir(parents=True, exist_ok=True)
+    for i in sorted(contacts.dirty):
+        rows = [c.to_dict() for c in contacts.shards[i].values()]
+        _atomic_write(Path(contacts.shard_path(i)), json.dumps({"contacts": rows}, ensure_ascii=False))
+    contacts.dirty.clear()
+    contacts.sizes = counts
+
+
+def write_shards(path: str, db: Dict) -> None:
+    """Write the manifest, then rewrite only the dirty shards (each atomically).
+
+    The manifest goes first so its next_id never falls behind ids already
+    saved in a shard. Every shard file of the directory already exists (see
+    shard_db), so a crash in between leaves old shard contents, never
+    missing ones.
+    """
+    manifest = _shard_manifest(db)
+    _atomic_write(Path(path), json.dumps(manifest))
+    _write_dirty_shards(_contacts(db), manifest["counts"])
+
+
+def _remove_shard_dir(shard_dir: Optional[str]) -> None:
+    if shard_dir and os.path.isdir(shard_dir):
+        for f in os.listdir(shard_dir):
+            os.unlink(os.path.join(shard_dir, f))
+        os.rmdir(shard_dir)
+
+
+def shard_db(path: str, db: Dict, count: int) -> int:
+    """Rewrite db at path as count shards; return the number of contacts.
+
+    Every shard file is written into a fresh directory before the manifest
+    is switched over atomically, so a crash leaves either the old book or
+    the new one. Any previous shard directory is then removed.
+    """
+    if count < 1:
+        raise ValueError("shard count must be at least 1.")
+    old = _contacts(db)
+    old_dir = old.dir if isinstance(old, ShardedContacts) else None
+    name = Path(path).name
+    new_dir = tempfile.mkdtemp(dir=Path(path).parent, prefix=name + '.shards.')
+    sharded = ShardedContacts(path, {"shards": count, "dir": os.path.basename(new_dir)})
+    sharded.shards = [{} for _ in range(count)]
+    n = 0
+    for c in old.values():
+        sharded.shards[c.id % count][c.id] = c
+        n += 1
+    sharded.dirty = set(range(count))
+    db["contacts"] = sharded
+    db["_sharded"] = True
+    db["_binary"] = False
+    manifest = _shard_manifest(db)
+    _write_dirty_shards(sharded, manifest["counts"])
+    _atomic_write(Path(path), json.dumps(manifest))
+    _remove_shard_dir(old_dir)
+    return n
+
+# ---------------- Shared writers ----------------
+
+class FileLock:
+    """Exclusive fcntl lock on <db>.lock, held for the duration of a with block."""
+
+    def __init__(self, path: str):
+        self.path = path + '.lock'
+        self._fd = None
+
+    def __enter__(self) -> 'FileLock':
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+def _spool_path(path: str) -> Path:
+    return Path(path + '.spool')
+
+
+# A .done file nobody collected this long after it was written belongs to a
+# submitter that was killed while waiting
+STALE_DONE_SECONDS = 600
+
+
+def _apply_op(db: Dict, op: Dict) -> Dict:
+    if op["op"] == "add":
+        try:
+            c = add_contact(db, op["name"], op["phone"], op.get("email"), op.get("tags"))
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "contact": c.to_dict()}
+    if op["op"] == "delete":
+        return {"ok": delete_contact(db, op["id"])}
+    return {"ok": False, "error": f"unknown op {op['op']!r}"}
+
+
+def _hand_out(spool: Path, results: Dict[str, Dict]) -> None:
+    # Give each still-spooled op of a batch its result, then retire the op
+    for name, result in results.items():
+        op = spool / (name + '.op')
+        if op.exists():
+            _atomic_write(op.with_suffix('.done'), json.dumps(result))
+            op.unlink()
+
+
+def _batch_saved(db: Dict, batch: Dict) -> bool:
+    # The save is atomic, so any one of the batch's changes tells whether all
+    # of them reached the DB: ids only grow, and deleted ids never come back
+    if batch["added"]:
+        return db["next_id"] > max(batch["added"])
+    contacts = _contacts(db)
+    return all(cid not in contacts for cid in batch["deleted"])
+
+
+def _drain_spool(path: str) -> int:
+    """Apply every pending op in the spool with one save; return how many.
+
+    Must be called with the FileLock held. Before saving, the batch's results
+    are written to <db>.spool/batch.json; they are handed out after the save
+    and the file is removed. A leader that dies in between leaves the file
+    behind: the next one hands its results out if the DB holds the batch, or
+    drops it so the ops are applied again, never twice. A failed save
+    reports the error to every submitter of the batch and re-raises. The
+    batch is folded into a snapshot like `compact`, since several journal
+    appends could not be made atomic together.
+    """
+    spool = _spool_path(path)
+    now = time.time()
+    for f in spool.glob('*.done'):
+        if now - f.stat().st_mtime > STALE_DONE_SECONDS:
+            f.unlink(missing_ok=True)
+    db = load_db(path)
+    batch_file = spool / 'batch.json'
+    if batch_file.exists():
+        batch = json.loads(batch_file.read_text(encoding='utf-8'))
+        if _batch_saved(db, batch):
+            _hand_out(spool, batch["results"])
+        batch_file.unlink()
+    ops = sorted(spool.glob('*.op'))
+    if not ops:
+        return 0
+    results: Dict[str, Dict] = {}
+    batch = {"results": results, "added": [], "deleted": []}
+    for f in ops:
+        try:
+            op = json.loads(f.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            results[f.stem] = {"ok": False, "error": f"unreadable op: {e}"}
+            continue
+        result = results[f.stem] = _apply_op(db, op)
+        if result["ok"] and op["op"] == "add":
+            batch["added"].append(result["contact"]["id"])
+        elif result["ok"]:
+            batch["deleted"].append(int(op["id"]))
+    try:
+        _atomic_write(batch_file, json.dumps(batch, ensure_ascii=False))
+        compact_db(path, db)
+    except Exception as e:
+        _hand_out(spool, {name: {"ok": False, "error": f"save failed: {e}"} for name in results})
+        batch_file.unlink(missing_ok=True)
+        raise
+    _hand_out(spool, results)
+    batch_file.unlink()
+    return len(results)
+
+
+def submit_op(path: str, op: Dict) -> Dict:
+    """Apply one add/delete op to the DB at path under group commit; return its result.
+
+    The op is spooled to <db>.spool/, then the process takes the lock. If an
+    earlier lock holder already applied it (its .done file exists) there is
+    nothing left to do; otherwise this process becomes the leader and drains
+    every op spooled so far, its own included, in a single atomic save. So
+    under contention one write serves many processes instead of one each.
+    """
+    spool = _spool_path(path)
+    spool.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time_ns():020d}-{os.getpid()}"
+    _atomic_write(spool / (name + '.op'), json.dumps(op, ensure_ascii=False))
+    done = spool / (name + '.done')
+    try:
+        with FileLock(path):
+            if not done.exists():
+                _drain_spool(path)
+        return json.loads(done.read_text(encoding='utf-8'))
+    finally:
+        done.unlink(missing_ok=True)
+
+# ---------------- Search index ----------------
+
+def _haystack(c: Dict) -> str:
+    # The text find_contacts() matches against
+    return ' '.join([
+        str(c.get('name','')),
+        str(c.get('phone','')),
+        str(c.get('email','')),
+        ' '.join(c.get('tags', []))
+    ]).lower()
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i+3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from 3-character substrings to contact ids.
+
+    A query's trigrams select candidates (smallest posting set first), which are
+    then verified with the same substring test as a full scan, so results are
+    identical. Queries shorter than 3 characters scan the cached haystacks.
+    """
+
+    def __init__(self, contacts: Iterable[Dict] = ()):
+        self.grams: Dict[str, Set[int]] = {}
+        self.hay: Dict[int, str] = {}   # insertion-ordered like the contact store
+        self.seq: Dict[int, int] = {}
+        self._next_seq = 0
+        for c in contacts:
+            self.add(c)
+
+    def add(self, c: Dict) -> None:
+        cid = int(c['id'])
+        hay = _haystack(c)
+        self.hay[cid] = hay
+        self.seq[cid] = self._next_seq
+        self._next_seq += 1
+        for g in _trigrams(hay):
+            self.grams.setdefault(g, set()).add(cid)
+
+    def remove(self, c: Dict) -> None:
+        cid = int(c['id'])
+        hay = self.hay.pop(cid, None)
+        if hay is None:
+            return
+        del self.seq[cid]
+        self._drop_grams(cid, hay)
+
+    def replace(self, old: Dict, new: Dict) -> None:
+        """Re-index a changed contact (same id), keeping its place in the order."""
+        cid = int(new['id'])
+        self._drop_grams(cid, self.hay[cid])
+        hay = self.hay[cid] = _haystack(new)
+        for g in _trigrams(hay):
+            self.grams.setdefault(g, set()).add(cid)
+
+    def _drop_grams(self, cid: int, hay: str) -> None:
+        for g in _trigrams(hay):
+            ids = self.grams[g]
+            ids.discard(cid)
+            if not ids:
+                del self.grams[g]
+
+    def search(self, q: str) -> List[int]:
+        """Ids whose haystack contains q (already lower-cased), in store order."""
+        if len(q) < 3:
+            return [cid for cid, hay in self.hay.items() if q in hay]
+        postings = []
+        for g in _trigrams(q):
+            ids = self.grams.get(g)
+            if not ids:
+                return []
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        hits = [cid for cid in candidates if q in self.hay[cid]]
+        hits.sort(key=self.seq.__getitem__)
+        return hits
+
+
+def build_search_index(db: Dict) -> TrigramIndex:
+    """Attach a TrigramIndex to db; add/delete keep it up to date from then on."""
+    ix = TrigramIndex(_contacts(db).values())
+    db.setdefault("_indexes", {})["trigram"] = ix
+    return ix
+
+# ---------------- Sorted indexes ----------------
+
+_NON_DIGITS = re.compile(r'[^0-9]')
+
+# Country calling codes are prefix-free: 1 and 7 are one digit, these are
+# two, and every other code is three digits
+_TWO_DIGIT_CC = frozenset(
+    '20 27 30 31 32 33 34 36 39 40 41 43 44 45 46 47 48 49 51 52 53 54 55 56 57 58 '
+    '60 61 62 63 64 65 66 81 82 84 86 90 91 92 93 94 95 98'.split())
+
+
+def normalize_phone(phone: str) -> str:
+    """National number digits, so every way of writing a number gets the same key.
+
+    Formatting is dropped, and so is the country code of an international
+    number ('+44 ...' or '0044 ...'), the trunk '0' of a national one
+    ('020 ...') and the leading '1' of an 11-digit North American number:
+    '+1 (555) 123-4567', '1-555-123-4567' and '555.123.4567' all give
+    '5551234567'. A partial number normalizes the same way, so it can be
+    matched as a prefix.
+    """
+    phone = (phone or '').strip()
+    digits = _NON_DIGITS.sub('', phone)
+    if phone.startswith('+') or digits.startswith('00'):
+        if not phone.startswith('+'):
+            digits = digits[2:]
+        if digits[:1] in ('1', '7'):
+            return digits[1:]
+        return digits[2:] if digits[:2] in _TWO_DIGIT_CC else digits[3:]
+    if digits.startswith('0'):
+        return digits[1:]
+    if len(digits) == 11 and digits.startswith('1'):
+        return digits[1:]
+    return digits
+
+
+INDEX_KEYS: Dict[str, Callable[[Contact], object]] = {
+    # Case-folded, so 'ada' sorts next to 'Ada' (ties by id)
+    "name": lambda c: (c.name or '').casefold(),
+    "id": lambda c: c.id,
+    "phone": lambda c: normalize_phone(c.phone),
+    # Reversed digits turn a suffix match into a prefix range
+    "phone_reversed": lambda c: normalize_phone(c.phone)[::-1],
+}
+
+
+class SortedIndex:
+    """Contacts kept ordered by (key(c), id) in parallel lists.
+
+    add/remove locate the slot with bisect (O(log n) plus the list shift), so
+    iteration is already in order, a page at position i is O(k), and a key range
+    is O(log n + k).
+    """
+
+    def __init__(self, key: Callable[[Contact], object], contacts: Iterable[Contact] = ()):
+        self.key = key
+        pairs = sorted(((key(c), c.id), c) for c in contacts)
+        self.keys: List[Tuple] = [k for k, _ in pairs]
+        self.items: List[Contact] = [c for _, c in pairs]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, c: Contact) -> None:
+        k = (self.key(c), c.id)
+        i = bisect.bisect_right(self.keys, k)
+        self.keys.insert(i, k)
+        self.items.insert(i, c)
+
+    def remove(self, c: Contact) -> None:
+        k = (self.key(c), c.id)
+        i = bisect.bisect_left(self.keys, k)
+        if i < len(self.keys) and self.keys[i] == k:
+            del self.keys[i]
+            del self.items[i]
+
+    def replace(self, old: Contact, new: Contact) -> None:
+        self.remove(old)
+        self.add(new)
+
+    def walk(self, reverse: bool = False) -> Iterator[Contact]:
+        """All contacts in key order; reversed keys still list equal keys by id."""
+        if not reverse:
+            yield from self.items
+            return
+        end = len(self.keys)
+        while end:
+            start = bisect.bisect_left(self.keys, (self.keys[end - 1][0],), 0, end)
+            yield from self.items[start:end]
+            end = start
+
+    def range(self, lo=None, hi=None) -> List[Contact]:
+        """Contacts whose key k satisfies lo <= k < hi (None = unbounded)."""
+        start = 0 if lo is None else bisect.bisect_left(self.keys, (lo,))
+        stop = len(self.keys) if hi is None else bisect.bisect_left(self.keys, (hi,), start)
+        return self.items[start:stop]
+
+    def equal(self, value) -> List[Contact]:
+        """Contacts whose key is exactly value, in id order."""
+        start = bisect.bisect_left(self.keys, (value,))
+        stop = start
+        while stop < len(self.keys) and self.keys[stop][0] == value:
+            stop += 1
+        return self.items[start:stop]
+
+
+def sorted_index(db: Dict, sort_by: str) -> SortedIndex:
+    """The SortedIndex for an INDEX_KEYS key, building and attaching it on first use."""
+    indexes = db.setdefault("_indexes", {})
+    ix = indexes.get(sort_by)
+    if ix is None:
+        ix = indexes[sort_by] = SortedIndex(INDEX_KEYS[sort_by], _contacts(db).values())
+    return ix
+
+
+def name_range(db: Dict, start: Optional[str] = None, stop: Optional[str] = None) -> List[Contact]:
+    """Contacts with start <= name < stop in name order, compared case-insensitively.
+
+    E.g. name_range(db, 'b', 'c') gives every name starting with 'b' or 'B'.
+    """
+    return sorted_index(db, "name").range(start and start.casefold(), stop and stop.casefold())
+
+PHONE_MATCHES = ('prefix', 'suffix', 'exact')
+
+
+def _phone_query(phone: str, match: str) -> Tuple[str, str]:
+    # Validate a lookup; return the INDEX_KEYS key to search and its digits
+    if match not in PHONE_MATCHES:
+        raise ValueError(f"match must be one of {', '.join(PHONE_MATCHES)}.")
+    digits = normalize_phone(phone)
+    if not digits:
+        raise ValueError("phone must contain at least one digit (after any country code).")
+    if match == 'suffix':
+        return "phone_reversed", digits[::-1]
+    return "phone", digits
+
+
+@_instrumented("lookup", len)
+def lookup_phone(db: Union[Dict, 'SqliteStore'], phone: str, match: str = 'prefix') -> List[Contact]:
+    """Contacts whose national number starts with, ends with or equals phone's.
+
+    Both sides go through normalize_phone(), so '+1 (555) 123' finds a
+    contact saved as '5551234' and '5551234' finds '+1 (555) 123-4567'.
+    Results are in digit order (ties by id). The sorted indexes are built on
+    first use (O(n log n)); after that each lookup is O(log n + k). An
+    SqliteStore keeps the same keys in indexed columns.
+    """
+    key, digits = _phone_query(phone, match)
+    if isinstance(db, SqliteStore):
+        return db.lookup_phone(key, digits, match == 'exact')
+    if match == 'exact':
+        return sorted_index(db, key).equal(digits)
+    # ':' sorts right after '9', so [digits, digits + ':') is exactly the prefix range
+    return sorted_index(db, key).range(digits, digits + ':')
+
+# ---------------- Duplicate detection ----------------
+
+# Shorter numbers (extensions, placeholders) are too ambiguous to match on
+MIN_PHONE_DIGITS = 7
+
+
+def _name_key(name: str) -> str:
+    # 'Lovelace,  ada' and 'Ada Lovelace' -> 'ada lovelace'
+    return ' '.join(sorted(name.casefold().replace(',', ' ').split()))
+
+
+def _dedupe_keys(c: Contact) -> Tuple[Optional[str], Optional[str]]:
+    # The blocking keys: lower-cased email, and national phone + name tokens
+    email = (c.email or '').strip().lower() or None
+    digits = normalize_phone(c.phone)
+    phone_name = digits + ':' + _name_key(c.name or '') if len(digits) >= MIN_PHONE_DIGITS else None
+    return email, phone_name
+
+
+def _clusters(pairs: Iterable[Tuple[int, int]]) -> List[List[int]]:
+    # Union-find over matching id pairs: sorted id clusters, ordered by lowest id
+    parent: Dict[int, int] = {}
+
+    def root(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = x = parent[parent[x]]  # path halving
+        return x
+
+    for a, b in pairs:
+        parent.setdefault(a, a)
+        parent.setdefault(b, b)
+        a, b = root(a), root(b)
+        if a != b:
+            # The lowest id becomes the root, i.e. the contact kept by a merge
+            parent[max(a, b)] = min(a, b)
+    clusters: Dict[int, List[int]] = {}
+    for cid in parent:
+        clusters.setdefault(root(cid), []).append(cid)
+    return [sorted(ids) for _, ids in sorted(clusters.items())]
+
+
+def _duplicate_pairs(contacts: Iterable[Contact]) -> Iterator[Tuple[int, int]]:
+    first: List[Dict[str, int]] = [{}, {}]
+    for c in contacts:
+        for seen, key in zip(first, _dedupe_keys(c)):
+            if key is not None:
+                other = seen.setdefault(key, c.id)
+                if other != c.id:
+                    yield other, c.id
+
+
+@_instrumented("dedupe", len)
+def find_duplicates(db: Union[Dict, 'SqliteStore']) -> List[List[Contact]]:
+    """Clusters of likely duplicates, each sorted by id, ordered by lowest id.
+
+    Contacts match when they share a lower-cased email, or share both their
+    national phone number (normalize_phone, so '+1 (555) 123-4567' equals
+    '555-123-4567') and their sorted name tokens (a shared phone alone may be
+    an office line). Each contact is hashed into those blocking
+    keys once and matches are joined with union-find, so the whole pass is
+    linear instead of comparing every pair. An SqliteStore groups its
+    indexed key columns in SQL instead.
+    """
+    if isinstance(db, SqliteStore):
+        return [db.get_contacts(ids) for ids in _clusters(db.duplicate_pairs())]
+    contacts = _contacts(db)
+    return [[contacts[cid] for cid in ids] for ids in _clusters(_duplicate_pairs(contacts.values()))]
+
+
+def merge_duplicates(db: Union[Dict, 'SqliteStore'], clusters: List[List[Contact]]) -> int:
+    """Fold each cluster into its lowest-id contact; return how many were removed.
+
+    The kept contact gets the union of all tags (its own first) and, if it has
+    no email, the first one found among the others. An SqliteStore commits
+    the whole merge as one transaction.
+    """
+    store = db if isinstance(db, SqliteStore) else None
+    removed = 0
+    for keep, *others in clusters:
+        tags = list(keep.tags)
+        email = keep.email
+        for c in others:
+            tags.extend(t for t in c.tags if t not in tags)
+            email = email or c.email
+        if tags != list(keep.tags) or email != keep.email:
+            merged = Contact(keep.id, keep.name, keep.phone, email, tags)
+            if store is not None:
+                store.put_contact(merged, commit=False)
+            else:
+                _put_contact(db, merged)
+        for c in others:
+            if store is not None:
+                store.delete_contact(c.id, commit=False)
+            else:
+                delete_contact(db, c.id)
+            removed += 1
+    if store is not None:
+        store.commit()
+    return removed
+
+# ---------------- SQLite backend ----------------
+
+class SqliteStore:
+    """Contact store in an SQLite file, used for --db sqlite:<path>.
+
+    Contacts live in an indexed table (WAL mode, ids never reused, like
+    next_id). find is served by an FTS5 trigram table over the same lower-cased
+    text find_contacts() scans, with candidates re-checked in Python so results
+    match exactly; without FTS5 support it falls back to instr(). list/find are
+    generators reading from a cursor, so the book is never fully materialized.
+    Each row also stores the keys lookup_phone() and find_duplicates() use
+    (normalized phone, reversed, and the dedupe blocking keys), each indexed.
+    Opening, queries and commits report load/list/find/get/save phases to the
+    instrumentation hooks like the JSON backend does.
+    """
+
+    @_instrumented("load")
+    def __init__(self, path: str):
+        if path != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS contacts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                email TEXT NOT NULL DEFAULT '',
+                tags TEXT NOT NULL DEFAULT '[]',
+                phone_key TEXT NOT NULL DEFAULT '',
+                phone_rkey TEXT NOT NULL DEFAULT '',
+                email_key TEXT,
+                dup_key TEXT
+            );
+            CREATE INDEX IF NOT EXISTS contacts_name_nocase ON contacts(name COLLATE NOCASE, id);
+            CREATE INDEX IF NOT EXISTS contacts_phone ON contacts(phone_key, id);
+            CREATE INDEX IF NOT EXISTS contacts_phone_rev ON contacts(phone_rkey, id);
+            CREATE INDEX IF NOT EXISTS contacts_email_key ON contacts(email_key) WHERE email_key IS NOT NULL;
+            CREATE INDEX IF NOT EXISTS contacts_dup_key ON contacts(dup_key) WHERE dup_key IS NOT NULL;
+        ''')
+        try:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts "
+                              "USING fts5(hay, tokenize='trigram')")
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite without FTS5/trigram: keep the text in a plain table
+            self.conn.execute("CREATE TABLE IF NOT EXISTS contacts_fts "
+                              "(rowid INTEGER PRIMARY KEY, hay TEXT NOT NULL)")
+            self.fts = False
+        self.conn.commit()
+
+    @staticmethod
+    def _row(row) -> Contact:
+        return Contact(row[0], row[1], row[2], row[3], json.loads(row[4]))
+
+    @staticmethod
+    def _columns(c: Contact) -> Tuple:
+        # name, phone, email, tags, phone_key, phone_rkey, email_key, dup_key
+        digits = normalize_phone(c.phone)
+        return (c.name, c.phone, c.email, json.dumps(c.tags, ensure_ascii=False),
+                digits, digits[::-1]) + _dedupe_keys(c)
+
+    def add_contact(self, name: str, phone: str, email: Optional[str] = None,
+                    tags: Optional[List[str]] = None, commit: bool = True) -> Contact:
+        contact = _make_contact(None, name, phone, email, tags)
+        cur = self.conn.execute(
+            "INSERT INTO contacts (name, phone, email, tags, phone_key, phone_rkey, email_key, dup_key) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._columns(contact))
+        contact.id = cur.lastrowid
+        self.conn.execute("INSERT INTO contacts_fts (rowid, hay) VALUES (?, ?)",
+                          (contact.id, _haystack(contact)))
+        if commit:
+            self.commit()
+        return contact
+
+    @_instrumented("list")
+    def list_contacts(self, sort_by: str = 'name', reverse: bool = False,
+                      limit: Optional[int] = None, offset: int = 0) -> Iterator[Contact]:
+        # Names compare case-insensitively, like the JSON backend's name index,
+        # so the ORDER BY walks contacts_name_nocase instead of sorting
+        key = 'id' if sort_by == 'id' else 'name COLLATE NOCASE'
+        # Ties keep id order in both directions, like a stable sorted()
+        order = f"{key} DESC, id" if reverse else f"{key}, id"
+        sql = f"SELECT id, name, phone, email, tags FROM contacts ORDER BY {order} LIMIT ? OFFSET ?"
+        for row in self.conn.execute(sql, (-1 if limit is None else limit, offset)):
+            yield self._row(row)
+
+    @_instrumented("find")
+    def find_contacts(self, query: str) -> Iterator[Contact]:
+        q = (query or '').strip().lower()
+        if not q:
+            return
+        if self.fts and len(q) >= 3:
+            sql = ("SELECT c.id, c.name, c.phone, c.email, c.tags, f.hay FROM contacts_fts f "
+                   "JOIN contacts c ON c.id = f.rowid WHERE f.hay MATCH ? ORDER BY c.id")
+            arg = '"' + q.replace('"', '""') + '"'
+        else:
+            sql = ("SELECT c.id, c.name, c.phone, c.email, c.tags, f.hay FROM contacts_fts f "
+                   "JOIN contacts c ON c.id = f.rowid WHERE instr(f.hay, ?) > 0 ORDER BY c.id")
+            arg = q
+        for row in self.conn.execute(sql, (arg,)):
+            if q in row[5]:
+                yield self._row(row)
+
+    @_instrumented("get", lambda c: int(c is not None))
+    def get_contact(self, cid: int) -> Optional[Contact]:
+        row = self.conn.execute("SELECT id, name, phone, email, tags FROM contacts WHERE id = ?",
+                                (int(cid),)).fetchone()
+        return self._row(row) if row else None
+
+    def get_contacts(self, ids: List[int]) -> List[Contact]:
+        """The contacts with these ids that exist, in id order."""
+        marks = ','.join('?' * len(ids))
+        return [self._row(row) for row in self.conn.execute(
+            f"SELECT id, name, phone, email, tags FROM contacts WHERE id IN ({marks}) ORDER BY id",
+            [int(i) for i in ids])]
+
+    def lookup_phone(self, key: str, digits: str, exact: bool = False) -> List[Contact]:
+        """Contacts whose phone_key (key 'phone') or phone_rkey starts with or equals digits.
+
+        Called by lookup_phone(), which validates and normalizes the query.
+        """
+        col = 'phone_key' if key == 'phone' else 'phone_rkey'
+        where = f"{col} = ?" if exact else f"{col} >= ? AND {col} < ?"
+        args = (digits,) if exact else (digits, digits + ':')
+        sql = f"SELECT id, name, phone, email, tags FROM contacts WHERE {where} ORDER BY {col}, id"
+        return [self._row(row) for row in self.conn.execute(sql, args)]
+
+    def duplicate_pairs(self) -> Iterator[Tuple[int, int]]:
+        """(first id, other id) for every contact sharing a blocking key with a lower one."""
+        for col in ('email_key', 'dup_key'):
+            sql = (f"SELECT group_concat(id) FROM contacts WHERE {col} IS NOT NULL "
+                   f"GROUP BY {col} HAVING count(*) > 1")
+            for (ids,) in self.conn.execute(sql):
+                first, *rest = sorted(map(int, ids.split(',')))
+                for cid in rest:
+                    yield first, cid
+
+    def put_contact(self, contact: Contact, commit: bool = True) -> None:
+        """Store a changed version of an existing contact."""
+        self.conn.execute(
+            "UPDATE contacts SET name = ?, phone = ?, email = ?, tags = ?, phone_key = ?, phone_rkey = ?, "
+            "email_key = ?, dup_key = ? WHERE id = ?", self._columns(contact) + (contact.id,))
+        self.conn.execute("UPDATE contacts_fts SET hay = ? WHERE rowid = ?", (_haystack(contact), contact.id))
+        if commit:
+            self.commit()
+
+    def delete_contact(self, cid: int, commit: bool = True) -> bool:
+        cur = self.conn.execute("DELETE FROM contacts WHERE id = ?", (int(cid),))
+        self.conn.execute("DELETE FROM contacts_fts WHERE rowid = ?", (int(cid),))
+        if commit:
+            self.commit()
+        return cur.rowcount > 0
+
+    @_instrumented("save")
+    def commit(self) -> None:
+        self.conn.commit()
+
+    @_instrumented("compact")
+    def compact(self) -> None:
+        """Checkpoint the WAL into the main file and reclaim free pages."""
+        self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.conn.execute('VACUUM')
+
+    def close(self) -> None:
+        self.commit()
+        self.conn.close()
+
+# ---------------- Bulk import / export ----------------
+
+CSV_FIELDS = ["id", "name", "phone", "email", "tags"]
+
+
+def _guess_format(path: str) -> str:
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def read_records(fp: TextIO, fmt: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """Stream (line number, record, error) from CSV or JSON-lines input.
+
+    CSV needs a header with name/phone and optionally email and tags (tags
+    separated by ';'); any id column is ignored. Unparseable rows yield an
+    error message instead of a record.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(fp)
+        for row in reader:
+            tags = [t for t in (row.get('tags') or '').split(';') if t]
+            yield reader.line_num, {"name": row.get('name') or '', "phone": row.get('phone') or '',
+                                    "email": row.get('email'), "tags": tags}, None
+        return
+    for lineno, line in enumerate(fp, 1):
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield lineno, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(rec, dict):
+            yield lineno, None, "expected a JSON object"
+            continue
+        yield lineno, rec, None
+
+
+@_instrumented("import", int)
+def import_contacts(db: Union[Dict, 'SqliteStore'], records: Iterable[Tuple[int, Optional[Dict], Optional[str]]],
+                    on_error: Optional[Callable[[int, str], None]] = None, batch_size: int = 0,
+                    flush: Optional[Callable[[], None]] = None) -> int:
+    """Add every valid record with add_contact() rules; return how many were added.
+
+    Invalid rows go to on_error(lineno, message) and are skipped. Nothing is
+    persisted per row: ``flush`` is called after every ``batch_size`` contacts
+    (0 = never), and the caller persists once at the end.
+    """
+    store = db if isinstance(db, SqliteStore) else None
+    added = 0
+    for lineno, rec, error in records:
+        if error is None:
+            tags = rec.get('tags') or []
+            bad = next((f for f in ('name', 'phone', 'email')
+                        if rec.get(f) is not None and not isinstance(rec[f], str)), None)
+            if bad is not None:
+                error = f"'{bad}' must be a string."
+            elif not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+                error = "'tags' must be a list of strings."
+            else:
+                try:
+                    if store is not None:
+                        store.add_contact(rec.get('name') or '', rec.get('phone') or '',
+                                          rec.get('email'), tags, commit=False)
+                    else:
+                        add_contact(db, rec.get('name') or '', rec.get('phone') or '',
+                                    rec.get('email'), tags)
+                except ValueError as e:
+                    error = str(e)
+        if error is not None:
+            if on_error is not None:
+                on_error(lineno, error)
+            continue
+        added += 1
+        if batch_size and flush is not None and added % batch_size == 0:
+            flush()
+    return added
+
+
+@_instrumented("export", int)
+def export_contacts(rows: Iterable[Dict], fp: TextIO, fmt: str) -> int:
+    """Write contacts as CSV or JSON lines, one at a time; return the count."""
+    n = 0
+    if fmt == 'csv':
+        writer = csv.writer(fp)
+        writer.writerow(CSV_FIELDS)
+        for c in rows:
+            writer.writerow([c['id'], c['name'], c['phone'], c.get('email', ''), ';'.join(c.get('tags', []))])
+            n += 1
+        return n
+    for c in rows:
+        fp.write(json.dumps(dict(c), ensure_ascii=False) + '\n')
+        n += 1
+    return n
 
 # ---------------- CLI helpers ----------------
 
-def _fmt_table(rows: List[Dict]) -> str:
-    if not rows:
-        return "(no contacts)"
-    headers = ["ID", "Name", "Phone", "Email", "Tags"]
-    cols = list(zip(*[
-        [str(r.get('id','')), r.get('name',''), r.get('phone',''), r.get('email',''), ','.join(r.get('tags', []))]
-        for r in rows
-    ]))
-    widths = [max(len(h), max(len(v) for v in col)) for h, col in zip(headers, cols)]
+TABLE_HEADERS = ["ID", "Name", "Phone", "Email", "Tags"]
+
+# Column widths are sized from this many leading rows; later, wider values
+# simply push their row out of alignment instead of buffering the whole table
+TABLE_SAMPLE_ROWS = 1000
+
+
+def _row_values(r: Dict) -> List[str]:
+    return [str(r.get('id','')), r.get('name',''), r.get('phone',''), r.get('email',''), ','.join(r.get('tags', []))]
+
+
+@_instrumented("render", int)
+def _write_table(rows: Iterable[Dict], out: TextIO, empty: str = "(no contacts)",
+                 sample: int = TABLE_SAMPLE_ROWS) -> int:
+    """Stream rows to out as a table and return how many were written.
+
+    Each row's cell strings are built once. Only the first ``sample`` rows are
+    held in memory (to size the columns); the rest are written as they arrive.
+    """
+    it = iter(rows)
+    head = [_row_values(r) for r in itertools.islice(it, sample)]
+    if not head:
+        out.write(empty + "\n")
+        return 0
+    widths = [max(len(h), max(len(v[i]) for v in head)) for i, h in enumerate(TABLE_HEADERS)]
     def fmt_row(values):
-        return " | ".join(v.ljust(w) for v, w in zip(values, widths))
-    line = "-+-".join('-'*w for w in widths)
-
-    out = [fmt_row(headers), line]
-    for r in rows:
-        out.append(fmt_row([
-            str(r.get('id','')),
-            r.get('name',''),
-            r.get('phone',''),
-            r.get('email',''),
-            ','.join(r.get('tags', []))
-        ]))
-    out.append(f"\nTotal: {len(rows)}")
-    return "\n".join(out)
+        return " | ".join(v.ljust(w) for v, w in zip(values, widths)) + "\n"
+
+    out.write(fmt_row(TABLE_HEADERS))
+    out.write("-+-".join('-'*w for w in widths) + "\n")
+    out.writelines(fmt_row(v) for v in head)
+    n = len(head)
+    for r in it:
+        out.write(fmt_row(_row_values(r)))
+        n += 1
+    out.write(f"\nTotal: {n}\n")
+    return n
+
+
+def _write_finds(find: Callable[[str], Iterable[Dict]], queries: List[str], out: TextIO) -> None:
+    # One table per query; with several, each is headed by its query
+    for i, q in enumerate(queries):
+        if len(queries) > 1:
+            out.write(("\n" if i else "") + f"== {q} ==\n")
+        _write_table(find(q), out, empty="No contacts found.")
+
+
+def _fmt_table(rows: List[Dict]) -> str:
+    buf = io.StringIO()
+    _write_table(rows, buf, sample=len(rows))
+    return buf.getvalue().rstrip("\n")
 
 
 def build_parser() -> argparse.ArgumentParser:
-    p = argparse.ArgumentParser(description="Mini Contact Book: add, list, find, delete")
-    p.add_argument('--db', help='Optional path to JSON DB for persistence')
+    p = argparse.ArgumentParser(description="Mini Contact Book: add, list, find, get, delete")
+    p.add_argument('--db', help='Optional path to JSON DB for persistence, or sqlite:<path>')
+    p.add_argument('--journal', action='store_true',
+                   help='Append changes to <db>.journal instead of rewriting the DB')
+    p.add_argument('--shared', action='store_true',
+                   help='Lock the DB and group-commit add/delete for concurrent writers')
+    p.add_argument('--workers', type=int,
+                   help='Processes for loading a sharded DB (default: automatic)')
+    p.add_argument('--stats', action='store_true',
+                   help='Print per-phase timings, bytes and record counts as JSON on stderr')
+    p.add_argument('--profile', metavar='FILE',
+                   help='Write a cProfile dump of the command to FILE')
 
     sub = p.add_subparsers(dest='cmd', required=True)
 
@@ -129,21 +1792,201 @@ def build_parser() -> argparse.ArgumentParser:
     pl = sub.add_parser('list', help='List contacts')
     pl.add_argument('--sort-by', choices=['name','id'], default='name')
     pl.add_argument('--reverse', action='store_true')
+    pl.add_argument('--limit', type=int, help='Show at most N contacts')
+    pl.add_argument('--offset', type=int, default=0, help='Skip the first N contacts')
 
     pf = sub.add_parser('find', help='Find contacts by substring across fields')
-    pf.add_argument('--q', required=True, help='Query substring')
+    pf.add_argument('--q', required=True, action='append',
+                    help='Query substring (repeatable: one table per query, loading the DB once)')
+    pf.add_argument('--index', action='store_true',
+                    help='Answer the queries from a trigram index built after loading; '
+                         'pays off from a few dozen queries per run')
+
+    pk = sub.add_parser('lookup', help='Find contacts by phone number, ignoring formatting')
+    pk.add_argument('--phone', required=True)
+    pk.add_argument('--match', choices=PHONE_MATCHES, default='prefix')
+
+    pg = sub.add_parser('get', help='Show a contact by ID')
+    pg.add_argument('--id', type=int, required=True)
 
     pd = sub.add_parser('delete', help='Delete a contact by ID')
     pd.add_argument('--id', type=int, required=True)
 
+    pi = sub.add_parser('import', help='Bulk-import contacts from CSV or JSON lines')
+    pi.add_argument('--file', required=True, help="Input file ('-' for stdin)")
+    pi.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension')
+    pi.add_argument('--batch-size', type=int, default=0,
+                    help='Persist every N imported contacts (default: once at the end)')
+
+    pe = sub.add_parser('export', help='Export all contacts as CSV or JSON lines')
+    pe.add_argument('--file', required=True, help="Output file ('-' for stdout)")
+    pe.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension')
+
+    sub.add_parser('compact', help='Fold <db>.journal into a new DB snapshot')
+
+    pdd = sub.add_parser('dedupe', help='Report (or merge) clusters of duplicate contacts')
+    pdd.add_argument('--merge', action='store_true',
+                     help='Keep the lowest id of each cluster, union tags, delete the rest')
+
+    psh = sub.add_parser('shard', help='Rewrite the DB as N shard files behind a manifest')
+    psh.add_argument('--count', type=int, default=16, help='Number of shards (default: 16)')
+
+    ps = sub.add_parser('snapshot', help='Rewrite the DB as a binary snapshot (or back to JSON)')
+    ps.add_argument('--format', choices=['binary', 'json'], default='binary')
+
     return p
 
 
-def main(argv=None) -> int:
-    parser = build_parser()
-    args = parser.parse_args(argv)
+def _open_text(path: str, mode: str) -> TextIO:
+    if path == '-':
+        return sys.stdin if mode == 'r' else sys.stdout
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def _run_import(args, db, flush: Callable[[], None]) -> int:
+    errors = 0
+
+    def report(lineno: int, message: str) -> None:
+        nonlocal errors
+        errors += 1
+        print(f"Error: line {lineno}: {message}", file=sys.stderr)
+
+    fmt = args.format or _guess_format(args.file)
+    try:
+        fp = _open_text(args.file, 'r')
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    try:
+        added = import_contacts(db, read_records(fp, fmt), report, args.batch_size, flush)
+    finally:
+        if fp is not sys.stdin:
+            fp.close()
+    flush()
+    print(f"Imported {added} contact(s), {errors} error(s)")
+    return 2 if errors else 0
 
-    db = load_db(args.db)
+
+def _run_export(args, rows: Iterable[Dict]) -> int:
+    fmt = args.format or _guess_format(args.file)
+    try:
+        fp = _open_text(args.file, 'w')
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    try:
+        n = export_contacts(rows, fp, fmt)
+    finally:
+        if fp is not sys.stdout:
+            fp.close()
+    if args.file != '-':
+        print(f"Exported {n} contact(s) to {args.file}")
+    return 0
+
+
+def _run_lookup(args, db: Union[Dict, SqliteStore]) -> int:
+    try:
+        rows = lookup_phone(db, args.phone, args.match)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    _write_table(rows, sys.stdout, empty="No contacts found.")
+    return 0
+
+
+def _run_dedupe(args, db: Union[Dict, SqliteStore], save: Callable[[], None]) -> int:
+    clusters = find_duplicates(db)
+    if not clusters:
+        print("No duplicates found.")
+        return 0
+    if not args.merge:
+        for keep, *others in clusters:
+            ids = ', '.join(f"#{c.id}" for c in others)
+            print(f"#{keep.id} {keep.name}: duplicates {ids}")
+        print(f"Found {len(clusters)} cluster(s), {sum(len(c) - 1 for c in clusters)} duplicate(s)")
+        return 0
+    removed = merge_duplicates(db, clusters)
+    save()
+    print(f"Merged {removed} duplicate(s) into {len(clusters)} contact(s)")
+    return 0
+
+
+def _run_sqlite(args, store: SqliteStore) -> int:
+    if args.cmd == 'add':
+        try:
+            c = store.add_contact(args.name, args.phone, args.email, args.tags)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        print(f"Added contact #{c['id']}: {c['name']}")
+        return 0
+
+    if args.cmd == 'list':
+        _write_table(store.list_contacts(args.sort_by, args.reverse, args.limit, args.offset), sys.stdout)
+        return 0
+
+    if args.cmd == 'find':
+        _write_finds(store.find_contacts, args.q, sys.stdout)  # FTS is the index here
+        return 0
+
+    if args.cmd == 'get':
+        c = store.get_contact(args.id)
+        if c is None:
+            print(f"Error: contact id {args.id} not found.", file=sys.stderr)
+            return 1
+        print(_fmt_table([c]))
+        return 0
+
+    if args.cmd == 'delete':
+        if not store.delete_contact(args.id):
+            print(f"Error: contact id {args.id} not found.", file=sys.stderr)
+            return 1
+        print(f"Deleted contact id {args.id}")
+        return 0
+
+    if args.cmd == 'import':
+        return _run_import(args, store, store.commit)
+
+    if args.cmd == 'export':
+        return _run_export(args, store.list_contacts('id'))
+
+    if args.cmd == 'lookup':
+        return _run_lookup(args, store)
+
+    if args.cmd == 'dedupe':
+        return _run_dedupe(args, store, lambda: None)  # merge_duplicates commits
+
+    if args.cmd == 'compact':
+        store.compact()
+        print(f"Compacted {args.db}")
+        return 0
+
+    print(f"Error: {args.cmd} is not supported with an SQLite DB.", file=sys.stderr)
+    return 2
+
+
+def _run_shared(args) -> int:
+    if args.cmd == 'add':
+        op = {"op": "add", "name": args.name, "phone": args.phone, "email": args.email, "tags": args.tags}
+    else:
+        op = {"op": "delete", "id": args.id}
+    result = submit_op(args.db, op)
+    if args.cmd == 'add':
+        if not result["ok"]:
+            print(f"Error: {result['error']}", file=sys.stderr)
+            return 2
+        print(f"Added contact #{result['contact']['id']}: {result['contact']['name']}")
+        return 0
+    if not result["ok"]:
+        print(f"Error: {result.get('error') or f'contact id {args.id} not found.'}", file=sys.stderr)
+        return 1
+    print(f"Deleted contact id {args.id}")
+    return 0
+
+
+def _run_json(args) -> int:
+    db = load_db(args.db, search_index=args.cmd == 'find' and args.index,
+                 journal=args.journal, workers=args.workers)
 
     if args.cmd == 'add':
         try:
@@ -156,16 +1999,23 @@ def main(argv=None) -> int:
         return 0
 
     if args.cmd == 'list':
-        rows = list_contacts(db, sort_by=args.sort_by, reverse=args.reverse)
-        print(_fmt_table(rows))
+        rows = list_contacts(db, args.sort_by, args.reverse, args.limit, args.offset)
+        _write_table(rows, sys.stdout)
         return 0
 
     if args.cmd == 'find':
-        rows = find_contacts(db, args.q)
-        if not rows:
-            print("No contacts found.")
-            return 0
-        print(_fmt_table(rows))
+        _write_finds(functools.partial(find_contacts, db), args.q, sys.stdout)
+        return 0
+
+    if args.cmd == 'lookup':
+        return _run_lookup(args, db)
+
+    if args.cmd == 'get':
+        c = get_contact(db, args.id)
+        if c is None:
+            print(f"Error: contact id {args.id} not found.", file=sys.stderr)
+            return 1
+        print(_fmt_table([c]))
         return 0
 
     if args.cmd == 'delete':
@@ -177,9 +2027,111 @@ def main(argv=None) -> int:
         print(f"Deleted contact id {args.id}")
         return 0
 
+    if args.cmd == 'import':
+        return _run_import(args, db, lambda: save_db(args.db, db))
+
+    if args.cmd == 'export':
+        return _run_export(args, _contacts(db).values())
+
+    if args.cmd == 'compact':
+        n = compact_db(args.db, db)
+        print(f"Compacted {n} journal record(s) into {args.db}")
+        return 0
+
+    if args.cmd == 'snapshot':
+        contacts = _contacts(db)
+        old_dir = contacts.dir if isinstance(contacts, ShardedContacts) else None
+        if args.format == 'binary':
+            # Full rewrite: also drops strings left over from deleted records
+            write_snapshot(args.db, db, reuse=False)
+        else:
+            db["_binary"] = False
+            db.pop("_sharded", None)
+            _write_snapshot(args.db, db)
+        # The manifest is gone, so its shard directory is now orphaned
+        _remove_shard_dir(old_dir)
+        print(f"Wrote {args.format} snapshot of {len(_contacts(db))} contact(s) to {args.db}")
+        return 0
+
+    if args.cmd == 'dedupe':
+        return _run_dedupe(args, db, lambda: save_db(args.db, db))
+
+    if args.cmd == 'shard':
+        try:
+            n = shard_db(args.db, db, args.count)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        print(f"Sharded {n} contact(s) into {args.count} shard(s) in {_contacts(db).dir}")
+        return 0
+
     # Should not happen
     return 2
 
 
+def _dispatch(parser, args) -> int:
+    if args.cmd == 'list' and ((args.limit is not None and args.limit < 0) or args.offset < 0):
+        parser.error('--limit and --offset must not be negative')
+    if args.cmd in ('compact', 'snapshot', 'shard') and not args.db:
+        print(f"Error: {args.cmd} requires --db.", file=sys.stderr)
+        return 2
+
+    if args.db and args.db.startswith(SQLITE_PREFIX):
+        try:
+            store = SqliteStore(args.db[len(SQLITE_PREFIX):])
+        except sqlite3.Error as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        try:
+            return _run_sqlite(args, store)
+        finally:
+            store.close()
+
+    if args.shared and args.db:
+        if fcntl is None:
+            print("Error: --shared needs fcntl file locking (POSIX only).", file=sys.stderr)
+            return 2
+        if args.cmd in ('add', 'delete'):
+            return _run_shared(args)
+    if args.db and fcntl is not None and (args.shared or args.cmd in WRITE_COMMANDS):
+        # Serialize read-modify-write cycles of concurrent processes; readers
+        # need no lock since every save is an atomic rename
+        with FileLock(args.db):
+            return _run_json(args)
+    return _run_json(args)
+
+
+def _run_instrumented(parser, args) -> int:
+    events: List[Dict] = []
+    hook = add_hook(events.append) if args.stats else None
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    t0 = time.perf_counter()
+    try:
+        return _dispatch(parser, args)
+    finally:
+        total = time.perf_counter() - t0
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if hook is not None:
+            remove_hook(hook)
+            stats = {"command": args.cmd, "seconds": total, "phases": events}
+            for key in ("bytes_read", "bytes_written"):
+                stats[key] = sum(e.get(key, 0) for e in events)
+            print(json.dumps(stats), file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.stats or args.profile:
+        return _run_instrumented(parser, args)
+    return _dispatch(parser, args)
+
+
 if __name__ == '__main__':
     raise SystemExit(main())
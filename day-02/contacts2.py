@@ -1,73 +1,490 @@
 import argparse
+import asyncio
+import contextlib
+import itertools
 import json
+import os
+import signal
+import stat
 import sys
-from typing import List, Dict
+import threading
+import time
+from typing import Dict, Iterable, List, MutableMapping, Optional
 from pathlib import Path
 
+from contacts import (Contact, ShardedContacts, SnapshotContacts, SortedIndex, TrigramIndex, _atomic_write,
+                      _journal_path, _replace, _replay_journal, _write_temp, encode_snapshot, is_snapshot,
+                      load_sharded, write_shards)
+
 class ContactBook:
-    def __init__(self, db_path: str = None):
-        self.contacts: List[Dict] = []
+    def __init__(self, db_path: str = None, autosave: bool = True,
+                 save_every: int = 1, save_interval: Optional[float] = None):
+        # Autosave after every save_every mutations, or save_interval seconds
+        # after the last save (a timer, so an idle book still gets written).
+        # autosave=False leaves persistence to the caller (see ContactService);
+        # close() saves leftovers.
+        self.autosave = autosave
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.pending = 0
+        self._last_save = time.monotonic()
+        self._batch_depth = 0
+        # (id, contact removed or None if added) per mutation inside a batch
+        self._undo: List = []
+        # The save timer runs on its own thread: mutations and saves hold this
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        self.search_index: Optional[TrigramIndex] = None
+        # Keyed by id (insertion order is id order) for O(1) get/delete
+        self.contacts: MutableMapping[int, Contact] = {}
         self.next_id = 1
+        self._index()
         self.db_path = db_path
-        if db_path and Path(db_path).exists():
+        self.binary = False  # loaded from (and saved as) a binary snapshot
+        self.sharded = False  # a contacts.py shard manifest, saved shard by shard
+        # Last contacts.py --journal record folded in, and whether the file
+        # stores next_id (contacts.py DBs do); both are kept on save
+        self.journal_seq = 0
+        self.keep_next_id = False
+        # 'sqlite:<path>' keeps the book in SQLite instead of loading it all
+        self.store = None
+        if db_path and db_path.startswith('sqlite:'):
+            from contacts import SqliteStore
+            self.store = SqliteStore(db_path[len('sqlite:'):])
+        elif db_path and (Path(db_path).exists() or Path(_journal_path(db_path)).exists()):
             self.load_contacts()
 
     def load_contacts(self):
-        try:
-            with open(self.db_path, 'r') as f:
-                data = json.load(f)
-                self.contacts = data.get('contacts', [])
-                self.next_id = max((c['id'] for c in self.contacts), default=0) + 1
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON in database file: {self.db_path}") from e
+        if is_snapshot(self.db_path):
+            # Stays memory-mapped: records are decoded only when touched
+            self.contacts = SnapshotContacts(self.db_path)
+            self.next_id = self.contacts.next_id
+            self.journal_seq = self.contacts.journal_seq or 0
+            self.binary = True
+        elif Path(self.db_path).exists():
+            try:
+                with open(self.db_path, 'r') as f:
+                    data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON in database file: {self.db_path}") from e
+            if "shards" in data:
+                # Written by `contacts.py shard`: the contacts live in the shard files
+                db = load_sharded(self.db_path, data)
+                self.contacts, self.next_id = db["contacts"], db["next_id"]
+                self.sharded = True
+            else:
+                self.contacts = {int(c['id']): Contact.from_dict(c) for c in data.get('contacts', [])}
+                self.next_id = max(data.get('next_id', 1), max(self.contacts, default=0) + 1)
+                self.keep_next_id = 'next_id' in data
+            self.journal_seq = data.get('journal_seq', 0)
+        # Fold in what `contacts.py --journal` appended since the last snapshot
+        db = {'next_id': self.next_id, 'contacts': self.contacts, 'journal_seq': self.journal_seq}
+        self.journal_seq = _replay_journal(_journal_path(self.db_path), db)
+        self.next_id = db['next_id']
+        self._index()
+
+    def _index(self):
+        # Built on first use (so opening a binary snapshot decodes nothing),
+        # then kept sorted on add/delete so list never re-sorts
+        self._by_name: Optional[SortedIndex] = None
+        self._by_id: Optional[SortedIndex] = None
+
+    @property
+    def by_name(self) -> SortedIndex:
+        if self._by_name is None:
+            self._by_name = SortedIndex(lambda c: c.name.casefold(), self.contacts.values())
+        return self._by_name
+
+    @property
+    def by_id(self) -> SortedIndex:
+        if self._by_id is None:
+            self._by_id = SortedIndex(lambda c: c.id, self.contacts.values())
+        return self._by_id
+
+    def _indexes(self) -> List:
+        return [ix for ix in (self._by_name, self._by_id, self.search_index) if ix is not None]
+
+    def build_search_index(self) -> TrigramIndex:
+        """Serve find_contacts() from a TrigramIndex, kept current by add/delete.
+
+        Worth it for a resident book (see ContactService); a one-shot CLI find
+        is cheaper as a scan.
+        """
+        self.search_index = TrigramIndex(self.contacts.values())
+        return self.search_index
 
     def save_contacts(self):
-        if self.db_path:
-            # Ensure parent directory exists before writing
-            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
-            with open(self.db_path, 'w') as f:
-                json.dump({'contacts': self.contacts}, f, indent=2)
+        with self._lock:
+            self._cancel_timer()
+            if self.store is not None:
+                return  # SQLite commits every mutation itself
+            if self.db_path and self.sharded:
+                # Manifest plus the shards touched since the last save
+                write_shards(self.db_path, self._db())
+            elif self.db_path and self.binary:
+                self.install_snapshot(self.stage_snapshot())
+            elif self.db_path:
+                data = {'next_id': self.next_id} if self.keep_next_id else {}
+                data['contacts'] = [c.to_dict() for c in self.contacts.values()]
+                if self.journal_seq:
+                    data['journal_seq'] = self.journal_seq
+                # Temp file + rename, so a crash never leaves a half-written book
+                _atomic_write(Path(self.db_path), json.dumps(data, indent=2))
+            # Only a save that went through clears the pending count, so a failed
+            # one is retried by the next
+            self.pending = 0
+            self._last_save = time.monotonic()
+
+    def _db(self) -> Dict:
+        db = {'next_id': self.next_id, 'contacts': self.contacts}
+        if self.journal_seq:
+            db['journal_seq'] = self.journal_seq  # replay skips what is saved here
+        return db
+
+    def stage_snapshot(self) -> str:
+        """Write a binary book's next snapshot to a temp file; return its path.
+
+        The current mapping stays open, so this can run in a worker thread
+        while the book is read elsewhere; install_snapshot() swaps it in.
+        """
+        with self._lock:
+            return _write_temp(Path(self.db_path), encode_snapshot(self._db()))
+
+    def install_snapshot(self, tmp: str):
+        """Unmap the book, rename tmp from stage_snapshot() over the DB and map it."""
+        with self._lock:
+            self._cancel_timer()
+            mapped = isinstance(self.contacts, SnapshotContacts)
+            if mapped:
+                self.contacts.close()  # a mapped file cannot be replaced on Windows
+            _replace(tmp, Path(self.db_path))
+            if mapped:
+                self.contacts = SnapshotContacts(self.db_path)
+            self.pending = 0
+            self._last_save = time.monotonic()
+
+    def _mutated(self):
+        self.pending += 1
+        if self._batch_depth or not self.autosave:
+            return
+        if (self.pending >= self.save_every or
+                (self.save_interval is not None and time.monotonic() - self._last_save >= self.save_interval)):
+            self.save_contacts()
+        elif self.save_interval is not None and self._timer is None:
+            delay = self.save_interval - (time.monotonic() - self._last_save)
+            self._timer = threading.Timer(max(delay, 0.0), self._timed_save)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_save(self):
+        with self._lock:
+            self._timer = None
+            # An open batch saves when it exits
+            if self.pending and not self._batch_depth:
+                try:
+                    self.save_contacts()
+                except OSError as e:
+                    print(f"Error: autosave failed: {e}", file=sys.stderr, flush=True)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def close(self):
+        """Save mutations the autosave policy has not written yet, then release the file."""
+        with self._lock:
+            self._cancel_timer()
+            if self.pending:
+                self.save_contacts()
+            if self.store is not None:
+                self.store.close()
+                self.store = None
+            if isinstance(self.contacts, SnapshotContacts):
+                self.contacts.close()
+
+    def __enter__(self) -> 'ContactBook':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Group mutations into one save when the block exits; undo them if it raises.
+
+        Nested batches save once, at the outermost exit; a nested batch that
+        raises undoes only its own changes. With an SQLite store each level is
+        a savepoint and the outermost one a transaction.
+        """
+        depth = self._batch_depth
+        savepoint = f"batch{depth}"
+        mark = (len(self._undo), self.next_id, self.pending)
+        if self.store is not None:
+            self.store.conn.execute(f"SAVEPOINT {savepoint}")
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            with self._lock:
+                self._batch_depth -= 1
+                if self.store is not None:
+                    self.store.conn.execute(f"ROLLBACK TO {savepoint}")
+                    self.store.conn.execute(f"RELEASE {savepoint}")
+                else:
+                    self._rollback(*mark)
+            raise
+        with self._lock:
+            self._batch_depth -= 1
+            if self.store is not None:
+                self.store.conn.execute(f"RELEASE {savepoint}")
+            if depth == 0:
+                self._undo.clear()
+                if self.store is not None:
+                    self.store.commit()
+                elif self.pending:
+                    self.save_contacts()
+
+    def _rollback(self, size: int, next_id: int, pending: int):
+        # Replay the undo log backwards, so a batch costs nothing up front
+        restored = False
+        while len(self._undo) > size:
+            cid, old = self._undo.pop()
+            if old is None:
+                c = self.contacts.pop(cid)
+                for ix in self._indexes():
+                    ix.remove(c)
+            else:
+                self.contacts[cid] = old
+                for ix in self._indexes():
+                    ix.add(old)
+                restored = True
+        if restored:
+            # Deleted contacts went back in at the end: restore id order
+            if isinstance(self.contacts, dict):
+                self.contacts = dict(sorted(self.contacts.items()))
+            elif isinstance(self.contacts, ShardedContacts):
+                shards = self.contacts.shards
+                shards[:] = [None if sh is None else dict(sorted(sh.items())) for sh in shards]
+            if self.search_index is not None:
+                self.build_search_index()
+        self.next_id, self.pending = next_id, pending
 
     def add_contact(self, name: str, phone: str, email: str, tags: List[str]) -> int:
-        contact = {
-            'id': self.next_id,
-            'name': name,
-            'phone': phone,
-            'email': email,
-            'tags': tags
-        }
-        self.contacts.append(contact)
-        self.next_id += 1
-        self.save_contacts()
-        return contact['id']
-
-    def list_contacts(self, sort_by: str) -> List[Dict]:
+        if self.store is not None:
+            return self.store.add_contact(name, phone, email, tags, commit=not self._batch_depth)['id']
+        with self._lock:
+            contact = Contact(self.next_id, name, phone, email, tags)
+            self.contacts[contact.id] = contact
+            for ix in self._indexes():
+                ix.add(contact)
+            if self._batch_depth:
+                self._undo.append((contact.id, None))
+            self.next_id += 1
+            self._mutated()
+            return contact.id
+
+    def list_contacts(self, sort_by: str) -> Iterable[Contact]:
+        if self.store is not None:
+            if sort_by not in ('name', 'id'):
+                raise ValueError(f"Invalid sort key: {sort_by}")
+            # Sorted by SQL and streamed from the cursor
+            return self.store.list_contacts(sort_by)
         if sort_by == 'name':
-            return sorted(self.contacts, key=lambda c: c['name'].lower())
+            return self.by_name.walk()
         if sort_by == 'id':
-            return sorted(self.contacts, key=lambda c: c['id'])
+            return self.by_id.walk()
         raise ValueError(f"Invalid sort key: {sort_by}")
 
-    def find_contacts(self, query: str) -> List[Dict]:
-        query = query.lower()
-        return [c for c in self.contacts if (
+    @staticmethod
+    def _matches(c: Contact, query: str) -> bool:
+        return (
             query in c['name'].lower() or
             query in c['phone'].lower() or
             query in c['email'].lower() or
             any(query in tag.lower() for tag in c['tags'])
-        )]
+        )
+
+    def find_contacts(self, query: str) -> Iterable[Contact]:
+        query = query.lower()
+        if self.store is not None:
+            # The store matches the joined text; narrow to per-field matches
+            return (c for c in self.store.find_contacts(query) if self._matches(c, query))
+        if self.search_index is not None:
+            # Candidates match the joined text; keep the per-field matches
+            hits = (self.contacts[cid] for cid in self.search_index.search(query))
+            return [c for c in hits if self._matches(c, query)]
+        return [c for c in self.contacts.values() if self._matches(c, query)]
 
     def delete_contact(self, contact_id: int) -> bool:
-        initial_len = len(self.contacts)
-        self.contacts = [c for c in self.contacts if c['id'] != contact_id]
-        if len(self.contacts) < initial_len:
-            self.save_contacts()
+        if self.store is not None:
+            return self.store.delete_contact(contact_id, commit=not self._batch_depth)
+        with self._lock:
+            c = self.contacts.pop(contact_id, None)
+            if c is None:
+                return False
+            for ix in self._indexes():
+                ix.remove(c)
+            if self._batch_depth:
+                self._undo.append((contact_id, c))
+            self._mutated()
             return True
-        return False
+
+    def top_by_name(self, n: int) -> List[Contact]:
+        """The first n contacts in (case-insensitive) name order."""
+        return self.by_name.items[:n]
+
+    def name_range(self, start: str = None, stop: str = None) -> List[Contact]:
+        """Contacts with start <= name < stop, compared case-insensitively."""
+        return self.by_name.range(start and start.casefold(), stop and stop.casefold())
+
+class ContactService:
+    """One resident ContactBook served as JSON lines over asyncio streams.
+
+    Requests are ``{"op": "add"|"list"|"find"|"delete", ...}`` with the same
+    arguments as the CLI (``contact_id`` for delete, optional ``limit`` for
+    list) and an optional ``"id"`` that is echoed back; responses carry
+    ``"result"`` or ``"error"``. Reads are answered straight from memory and
+    never wait for writers. Writes are serialized by a lock, and instead of
+    saving per write the book is saved at most once per ``save_delay`` seconds
+    (in a worker thread, still under the write lock) and on shutdown. A binary
+    book is only remapped onto its new snapshot back on the event loop. A failed
+    background save is logged, reported to the next write request and retried;
+    on shutdown the final save raises.
+
+    Reads run on the event loop, so they are kept cheap: find uses a trigram
+    index of the resident book and a limited list reads only its page.
+    """
+
+    def __init__(self, book: ContactBook, save_delay: float = 0.5):
+        self.book = book
+        book.autosave = False
+        if book.store is None:
+            book.build_search_index()
+        self.save_delay = save_delay
+        self.write_lock = asyncio.Lock()
+        self.saves = 0
+        self.save_error: Optional[BaseException] = None
+        self._save_task: Optional[asyncio.Task] = None
+
+    async def handle(self, req: Dict) -> Dict:
+        op = req['op']
+        book = self.book
+        if op == 'find':
+            return {'result': [c.to_dict() for c in book.find_contacts(str(req['q']))]}
+        if op == 'list':
+            rows = book.list_contacts(req.get('sort_by', 'id'))
+            if req.get('limit') is not None:
+                rows = itertools.islice(rows, int(req['limit']))
+            return {'result': [c.to_dict() for c in rows]}
+        if op in ('add', 'delete') and self.save_error is not None:
+            error, self.save_error = self.save_error, None
+            self._schedule_save()  # the changes are still pending: try again
+            return {'error': f"save failed: {error}"}
+        if op == 'add':
+            async with self.write_lock:
+                cid = book.add_contact(str(req['name']), str(req['phone']), str(req.get('email') or ''),
+                                       [str(t) for t in req.get('tags') or []])
+            self._schedule_save()
+            return {'result': cid}
+        if op == 'delete':
+            async with self.write_lock:
+                ok = book.delete_contact(int(req['contact_id']))
+            if ok:
+                self._schedule_save()
+            return {'result': ok}
+        raise ValueError(f"unknown op {op!r}")
+
+    async def handle_line(self, line: bytes) -> bytes:
+        resp = {}
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("request must be a JSON object")
+            if 'id' in req:
+                resp['id'] = req['id']
+            resp.update(await self.handle(req))
+        except KeyError as e:
+            resp['error'] = f"missing field {e}"
+        except (ValueError, TypeError, AttributeError, OverflowError) as e:
+            resp['error'] = str(e)
+        return (json.dumps(resp) + '\n').encode('utf-8')
+
+    async def client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            async for line in reader:
+                if line.strip():
+                    writer.write(await self.handle_line(line))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _schedule_save(self) -> None:
+        # The first write after a save starts the timer; later ones ride along
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.ensure_future(self._save_later())
+            self._save_task.add_done_callback(self._saved)
+
+    def _saved(self, task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is None:
+            return
+        self.save_error = task.exception()
+        print(f"Error: save failed: {self.save_error}", file=sys.stderr, flush=True)
+
+    async def _save_later(self) -> None:
+        await asyncio.sleep(self.save_delay)
+        await self.flush()
+
+    async def flush(self) -> None:
+        book = self.book
+        async with self.write_lock:
+            loop = asyncio.get_running_loop()
+            if book.binary and not book.sharded and book.store is None and book.db_path:
+                # Reads on the loop use the mapping: write the new snapshot in a
+                # thread, then unmap and swap it in here, between two requests
+                book.install_snapshot(await loop.run_in_executor(None, book.stage_snapshot))
+            else:
+                await loop.run_in_executor(None, book.save_contacts)
+            self.saves += 1
+
+    async def serve(self, socket_path: Optional[str] = None, host: str = '127.0.0.1',
+                    port: Optional[int] = None, ready=None) -> None:
+        """Serve until SIGINT/SIGTERM, then save any pending writes and close the book."""
+        if socket_path:
+            if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                os.unlink(socket_path)
+            server = await asyncio.start_unix_server(self.client, path=socket_path)
+        else:
+            server = await asyncio.start_server(self.client, host, port)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        if ready is not None:
+            ready(server)
+        try:
+            await stop.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            try:
+                if self._save_task is not None:
+                    # Let a pending save finish; a failure was logged by _saved
+                    with contextlib.suppress(Exception):
+                        await self._save_task
+                if self.book.pending:
+                    await self.flush()  # raises if the book still cannot be saved
+                self.book.close()
+            finally:
+                if socket_path and os.path.exists(socket_path):
+                    os.unlink(socket_path)
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Contact book CLI")
-    parser.add_argument('--db', help="Path to JSON database")
+    parser.add_argument('--db', help="Path to JSON database, or sqlite:<path>")
     subparsers = parser.add_subparsers(dest='command', required=True)
 
     # Add command
@@ -89,18 +506,37 @@ def parse_args():
     delete_parser = subparsers.add_parser('delete', help="Delete a contact")
     delete_parser.add_argument('--id', type=int, required=True)
 
+    # Serve command
+    serve_parser = subparsers.add_parser('serve', help="Keep the book in memory and serve JSON-lines requests")
+    where = serve_parser.add_mutually_exclusive_group(required=True)
+    where.add_argument('--socket', help="Unix socket path")
+    where.add_argument('--port', type=int, help="TCP port on 127.0.0.1")
+    serve_parser.add_argument('--save-delay', type=float, default=0.5,
+                              help="Seconds to batch writes before saving (default: 0.5)")
+
     return parser.parse_args()
 
-def format_contact(contact: Dict) -> str:
+def format_contact(contact: Contact) -> str:
     tags = ', '.join(contact['tags'])
     return f"#{contact['id']}: {contact['name']}, {contact['phone']}, {contact['email']}, tags: [{tags}]"
 
 
 def main():
     args = parse_args()
+    book = None
     try:
         book = ContactBook(args.db)
 
+        if args.command == 'serve':
+            service = ContactService(book, args.save_delay)
+
+            def ready(server):
+                where = args.socket or ':'.join(map(str, server.sockets[0].getsockname()[:2]))
+                print(f"Serving {args.db or 'in-memory book'} on {where}", flush=True)
+
+            asyncio.run(service.serve(args.socket, port=args.port, ready=ready))
+            sys.exit(0)
+
         if args.command == 'add':
             contact_id = book.add_contact(args.name, args.phone, args.email, args.tags)
             print(f"Added contact #{contact_id}: {args.name}")
@@ -131,6 +567,14 @@ def main():
     except (OSError, IOError) as e:
         print(f"I/O error: {e}", file=sys.stderr)
         sys.exit(2)
+    finally:
+        # Every exit path, sys.exit() included: save what is pending and unmap
+        if book is not None:
+            try:
+                book.close()
+            except (OSError, ValueError) as e:
+                print(f"Error: could not save on exit: {e}", file=sys.stderr)
+                sys.exit(2)
 
 if __name__ == '__main__':
     main()
@@ -1,13 +1,23 @@
 import json
 import subprocess
 import sys
+import time
 from pathlib import Path
+
+import pytest
 from day_01_import_helper import import_from_path
 
 # Import module functions for unit testing
 mod = import_from_path('contacts', 'day-02/contacts.py')
 
 
+@pytest.fixture
+def book_mod(monkeypatch):
+    """The contacts2 module (it imports contacts by name, so day-02 goes on sys.path)."""
+    monkeypatch.syspath_prepend('day-02')
+    return import_from_path('contacts2', 'day-02/contacts2.py')
+
+
 def run_cli(args, cwd=None):
     cmd = [sys.executable, 'day-02/contacts.py'] + args
     res = subprocess.run(cmd, capture_output=True, text=True, cwd=cwd)
@@ -39,6 +49,12 @@ def test_find_and_delete(tmp_path):
     # Should match Alice and Alicia only
     assert 'Alice' in out and 'Alicia' in out and 'Charlie' not in out
 
+    # Several queries in one run, answered from the trigram index
+    queries = ['--q', 'lic', '--q', 'char', '--q', 'zz']
+    code, indexed, err = run_cli(['--db', str(db), 'find', '--index'] + queries)
+    assert code == 0 and indexed == run_cli(['--db', str(db), 'find'] + queries)[1]
+    assert indexed.startswith('== lic ==\n') and '== char ==' in indexed and 'No contacts found.' in indexed
+
     # Delete existing
     code, out, err = run_cli(['--db', str(db), 'delete', '--id', '2'])
     assert code == 0 and 'Deleted contact id 2' in out
@@ -64,3 +80,862 @@ def test_function_add_validation():
     c = mod.add_contact(db, name='Zoe', phone='999', email='z@example.com', tags=['se'])
     assert c['id'] == 1 and c['name'] == 'Zoe'
     assert db['next_id'] == 2
+
+
+def test_get_command(tmp_path):
+    db = tmp_path / 'contacts.json'
+    run_cli(['--db', str(db), 'add', '--name', 'Ada', '--phone', '123'])
+    run_cli(['--db', str(db), 'add', '--name', 'Bob', '--phone', '456'])
+
+    code, out, err = run_cli(['--db', str(db), 'get', '--id', '2'])
+    assert code == 0 and 'Bob' in out and 'Ada' not in out
+
+    code, out, err = run_cli(['--db', str(db), 'get', '--id', '7'])
+    assert code == 1 and 'not found' in err
+
+
+def test_function_get_and_delete_by_id():
+    db = {"next_id": 1, "contacts": []}
+    for name in ['A', 'B', 'C']:
+        mod.add_contact(db, name=name, phone='1')
+    assert mod.get_contact(db, 2)['name'] == 'B'
+    assert mod.delete_contact(db, 2) is True
+    assert mod.delete_contact(db, 2) is False
+    assert mod.get_contact(db, 2) is None
+    # Remaining contacts keep insertion order
+    assert [c['name'] for c in mod.find_contacts(db, '1')] == ['A', 'C']
+
+
+def test_saved_file_keeps_json_list_format(tmp_path):
+    db_path = tmp_path / 'contacts.json'
+    run_cli(['--db', str(db_path), 'add', '--name', 'Ada', '--phone', '123'])
+    data = json.loads(db_path.read_text())
+    assert data == {"next_id": 2, "contacts": [
+        {"id": 1, "name": "Ada", "phone": "123", "email": "", "tags": []}]}
+
+
+def test_saves_keep_file_mode(tmp_path, book_mod):
+    import stat
+    path = tmp_path / 'c.json'
+    db = mod.load_db(str(path))
+    mod.add_contact(db, 'Ada', '1')
+    mod.save_db(str(path), db)
+    # A new file gets what open() would give it, not mkstemp's 0600
+    assert stat.S_IMODE(path.stat().st_mode) == 0o666 & ~mod._UMASK
+    path.chmod(0o640)
+    book_mod.ContactBook(str(path)).add_contact('Bob', '2', '', [])
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+
+
+def test_contact_record_is_compact_and_dict_compatible():
+    c = mod.Contact.from_dict({"id": 3, "name": "Ada", "phone": "1", "email": "a@x", "tags": ["sa" + "les"]})
+    assert not hasattr(c, '__dict__')
+    assert c['name'] == 'Ada' and c.get('email') == 'a@x' and c.get('missing', 0) == 0
+    assert c.tags[0] is mod.Contact(4, 'Bob', '2', '', ['sales']).tags[0]
+    assert c.to_dict() == dict(c, tags=['sales']) == {"id": 3, "name": "Ada", "phone": "1", "email": "a@x", "tags": ["sales"]}
+    assert c == mod.Contact.from_dict(json.loads(json.dumps(c.to_dict())))
+
+
+def test_contactbook_keeps_file_format(tmp_path, book_mod):
+    path = tmp_path / 'book.json'
+    book = book_mod.ContactBook(str(path))
+    book.add_contact('Ada', '123', 'a@x', ['vip'])
+    assert json.loads(path.read_text()) == {"contacts": [
+        {"id": 1, "name": "Ada", "phone": "123", "email": "a@x", "tags": ["vip"]}]}
+    assert [c['name'] for c in book_mod.ContactBook(str(path)).find_contacts('VIP')] == ['Ada']
+
+
+def test_contactbook_batch_saves_once_and_rolls_back(tmp_path, monkeypatch, book_mod):
+    path = tmp_path / 'book.json'
+    book = book_mod.ContactBook(str(path))
+    saves = []
+    real_save = book.save_contacts
+    monkeypatch.setattr(book, 'save_contacts', lambda: (saves.append(1), real_save()))
+
+    with book.batch():
+        for i in range(100):
+            book.add_contact(f'N{i}', str(i), '', [])
+        book.delete_contact(1)
+    assert len(saves) == 1 and len(json.loads(path.read_text())['contacts']) == 99
+
+    try:
+        with book.batch():
+            book.add_contact('Ghost', '0', '', [])
+            book.delete_contact(2)
+            raise RuntimeError('boom')
+    except RuntimeError:
+        pass
+    assert len(saves) == 1 and len(book.contacts) == 99 and book.next_id == 101
+    assert book.find_contacts('ghost') == [] and book.top_by_name(1)[0].name == 'N1'  # id 2 is back
+    assert book.add_contact('Next', '1', '', []) == 101
+
+    sq = book_mod.ContactBook('sqlite:' + str(tmp_path / 'book.db'))
+    try:
+        with sq.batch():
+            sq.add_contact('Ada', '1', '', [])
+            raise RuntimeError('boom')
+    except RuntimeError:
+        pass
+    with sq.batch():
+        sq.add_contact('Bob', '2', '', [])
+    assert [c['name'] for c in sq.list_contacts('id')] == ['Bob']
+
+    # A nested batch that raises undoes only its own changes
+    for nested in (book, sq):
+        before = [c['name'] for c in nested.list_contacts('id')]
+        with nested.batch():
+            nested.add_contact('Outer', '3', '', [])
+            try:
+                with nested.batch():
+                    nested.add_contact('Inner', '4', '', [])
+                    nested.delete_contact(next(iter(nested.list_contacts('id')))['id'])
+                    raise RuntimeError('boom')
+            except RuntimeError:
+                pass
+        assert [c['name'] for c in nested.list_contacts('id')] == before + ['Outer']
+    assert [c['name'] for c in book_mod.ContactBook(str(path)).list_contacts('id')][-1] == 'Outer'
+    sq.close()
+    assert [c['name'] for c in book_mod.ContactBook('sqlite:' + str(tmp_path / 'book.db')).list_contacts('id')] \
+        == ['Bob', 'Outer']
+
+
+def test_contactbook_autosave_policy(tmp_path, monkeypatch, book_mod):
+    path = tmp_path / 'book.json'
+    book = book_mod.ContactBook(str(path), save_every=10)
+    for i in range(25):
+        book.add_contact(f'N{i}', str(i), '', [])
+    assert len(json.loads(path.read_text())['contacts']) == 20 and book.pending == 5
+    book.close()
+    assert len(json.loads(path.read_text())['contacts']) == 25
+
+    clock = [1000.0]
+    monkeypatch.setattr(book_mod.time, 'monotonic', lambda: clock[0])
+    timed = book_mod.ContactBook(str(path), save_every=1000, save_interval=30)
+    timed.add_contact('A', '1', '', [])
+    assert timed.pending == 1
+    clock[0] += 31
+    timed.add_contact('B', '2', '', [])
+    assert timed.pending == 0 and len(json.loads(path.read_text())['contacts']) == 27
+    monkeypatch.undo()
+
+    # An idle book is still saved save_interval seconds after a mutation
+    idle = book_mod.ContactBook(str(path), save_every=1000, save_interval=0.05)
+    idle.add_contact('C', '3', '', [])
+    assert idle.pending == 1
+    deadline = time.monotonic() + 5
+    while idle.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert idle.pending == 0 and len(json.loads(path.read_text())['contacts']) == 28
+    idle.close()
+
+
+def test_contactbook_serve_socket(tmp_path):
+    import socket
+    if not hasattr(socket, 'AF_UNIX'):
+        pytest.skip('needs Unix sockets')
+    path = tmp_path / 'book.json'
+    sock_path = str(tmp_path / 'book.sock')
+    proc = subprocess.Popen([sys.executable, 'day-02/contacts2.py', '--db', str(path), 'serve',
+                             '--socket', sock_path, '--save-delay', '0.05'],
+                            stdout=subprocess.PIPE, text=True)
+    try:
+        assert 'Serving' in proc.stdout.readline()
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.connect(sock_path)
+        r, w = s.makefile('r'), s.makefile('w')
+
+        def call(req):
+            w.write(json.dumps(req) + '\n')
+            w.flush()
+            return json.loads(r.readline())
+
+        assert call({"op": "add", "name": "Ada", "phone": "1", "tags": ["vip"], "id": 7}) == {"id": 7, "result": 1}
+        assert call({"op": "add", "name": "Bob", "phone": "2"})['result'] == 2
+        assert [c['name'] for c in call({"op": "find", "q": "vip"})['result']] == ['Ada']
+        assert [c['id'] for c in call({"op": "list", "sort_by": "name", "limit": 1})['result']] == [1]
+        assert call({"op": "delete", "contact_id": 2}) == {"result": True}
+        assert 'error' in call({"op": "nope"}) and 'error' in call({"op": "find"})
+        assert 'error' in call({"op": "delete", "contact_id": 1e400})  # OverflowError, connection stays up
+        assert call({"op": "list", "limit": 5})['result'][0]['name'] == 'Ada'
+        s.close()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    assert [c['name'] for c in json.loads(path.read_text())['contacts']] == ['Ada']
+
+
+def test_contact_service_reports_failed_saves(tmp_path, monkeypatch, capsys, book_mod):
+    import asyncio
+    path = tmp_path / 'book.json'
+    book = book_mod.ContactBook(str(path))
+    service = book_mod.ContactService(book, save_delay=0)
+    real_save = book.save_contacts
+    fail = [True]
+
+    def save():
+        if fail[0]:
+            raise OSError('disk full')
+        real_save()
+
+    monkeypatch.setattr(book, 'save_contacts', save)
+
+    async def run():
+        assert await service.handle({"op": "add", "name": "Ada", "phone": "1"}) == {"result": 1}
+        await asyncio.sleep(0.05)
+        assert 'disk full' in (await service.handle({"op": "add", "name": "Bob", "phone": "2"}))['error']
+        fail[0] = False
+        await service._save_task  # the retry
+        assert [c['name'] for c in (await service.handle({"op": "find", "q": "ad"}))['result']] == ['Ada']
+
+    asyncio.run(run())
+    assert 'save failed: disk full' in capsys.readouterr().err
+    assert [c['name'] for c in json.loads(path.read_text())['contacts']] == ['Ada']
+    assert book.pending == 0 and book.search_index is not None
+
+
+def test_contact_service_reads_binary_book_during_save(tmp_path, book_mod):
+    import asyncio
+    import threading
+    path = tmp_path / 'book.db'
+    db = {"next_id": 1, "contacts": []}
+    mod.add_contact(db, 'Ada', '1')
+    mod.write_snapshot(str(path), db)
+    book = book_mod.ContactBook(str(path))
+    service = book_mod.ContactService(book, save_delay=0)
+    old = book.contacts
+    real_stage = book.stage_snapshot
+    staging, go = threading.Event(), threading.Event()
+
+    def stage():
+        staging.set()
+        assert go.wait(5)
+        return real_stage()
+
+    book.stage_snapshot = stage
+
+    async def names():
+        book.contacts._cache.clear()  # decode from the map again
+        return [c['name'] for c in (await service.handle({"op": "list"}))['result']]
+
+    async def run():
+        await service.handle({"op": "add", "name": "Bob", "phone": "2"})
+        assert await asyncio.get_running_loop().run_in_executor(None, staging.wait, 5)
+        during = await names()  # the save is running in a worker thread
+        go.set()
+        await service._save_task
+        return during, await names()
+
+    assert asyncio.run(run()) == (['Ada', 'Bob'], ['Ada', 'Bob'])
+    assert old.mm.closed and not book.contacts.mm.closed and book.pending == 0
+    assert [c.name for c in mod.SnapshotContacts(str(path)).values()] == ['Ada', 'Bob']
+    book.close()
+
+
+def test_stats_and_profile_flags(tmp_path):
+    db = tmp_path / 'contacts.json'
+    code, out, err = run_cli(['--db', str(db), '--stats', 'add', '--name', 'Ada', '--phone', '1'])
+    stats = json.loads(err.splitlines()[-1])
+    assert code == 0 and stats['command'] == 'add'
+    assert [p['phase'] for p in stats['phases']] == ['load', 'save']
+    assert stats['bytes_written'] == db.stat().st_size and stats['phases'][1]['records'] == 1
+
+    prof = tmp_path / 'find.prof'
+    code, out, err = run_cli(['--db', str(db), '--stats', '--profile', str(prof), 'find', '--q', 'ada'])
+    stats = json.loads(err.splitlines()[-1])
+    assert code == 0 and 'Ada' in out
+    assert {p['phase']: p.get('records') for p in stats['phases']} == {'load': 1, 'find': 1, 'render': 1}
+    assert stats['bytes_read'] == db.stat().st_size
+    import pstats
+    assert pstats.Stats(str(prof)).total_calls > 0
+
+
+def test_hook_api_reports_phases(tmp_path):
+    events = []
+    hook = mod.add_hook(events.append)
+    try:
+        db = mod.load_db(str(tmp_path / 'c.json'))
+        mod.add_contact(db, 'Ada', '1')
+        mod.save_db(str(tmp_path / 'c.json'), db)
+        mod.find_contacts(db, 'ada')
+    finally:
+        mod.remove_hook(hook)
+    assert [e['phase'] for e in events] == ['load', 'save', 'find']
+    assert all(e['seconds'] >= 0 for e in events) and events[1]['bytes_written'] > 0
+    mod.find_contacts(db, 'ada')
+    assert len(events) == 3  # nothing recorded once the hook is removed
+
+
+def test_stats_cover_sqlite_store(tmp_path):
+    db = 'sqlite:' + str(tmp_path / 'c.db')
+    code, out, err = run_cli(['--db', db, '--stats', 'add', '--name', 'Ada', '--phone', '1'])
+    assert code == 0 and [p['phase'] for p in json.loads(err.splitlines()[-1])['phases']] == ['load', 'save', 'save']
+    code, out, err = run_cli(['--db', db, '--stats', 'find', '--q', 'ada'])
+    stats = json.loads(err.splitlines()[-1])
+    assert code == 0 and 'Ada' in out
+    assert {p['phase']: p.get('records') for p in stats['phases']} == {'load': None, 'find': 1, 'render': 1, 'save': None}
+
+
+def test_failing_hook_does_not_mask_errors(tmp_path):
+
+    def broken(event):
+        raise RuntimeError('hook bug')
+    events = []
+    hooks = [mod.add_hook(broken), mod.add_hook(events.append)]
+    try:
+        (tmp_path / 'file').write_text('')
+        with pytest.raises(OSError):  # not the hook's RuntimeError
+            mod.save_db(str(tmp_path / 'file' / 'c.json'), {"next_id": 1, "contacts": []})
+        with pytest.raises(RuntimeError, match='hook bug'):
+            mod.find_contacts({"next_id": 1, "contacts": []}, 'x')
+    finally:
+        for hook in hooks:
+            mod.remove_hook(hook)
+    assert [e['phase'] for e in events] == ['save', 'find']
+
+
+def test_trigram_index_matches_scan():
+    import random
+    rng = random.Random(7)
+    words = ['ada', 'lovelace', 'bob', 'alice', 'alicia', 'sales', 'apac', 'math', 'x']
+    plain = {"next_id": 1, "contacts": []}
+    indexed = {"next_id": 1, "contacts": []}
+    ix = mod.build_search_index(indexed)
+    for i in range(200):
+        name = ' '.join(rng.sample(words, 2)).title()
+        tags = rng.sample(words, rng.randint(0, 2))
+        for db in (plain, indexed):
+            mod.add_contact(db, name=name, phone=f'+44 {i:04d}', email=f'{words[i % 9]}@example.com', tags=tags)
+    for cid in range(1, 200, 3):
+        mod.delete_contact(plain, cid)
+        mod.delete_contact(indexed, cid)
+
+    for q in ['a', 'li', 'lic', 'ALICIA', 'ce lo', '@ex', '+44 01', 'ales', 'zzz', ' ', '']:
+        assert mod.find_contacts(indexed, q) == mod.find_contacts(plain, q), q
+    assert 1 not in ix.hay
+
+
+def test_journal_mode_appends_and_compacts(tmp_path):
+    db = tmp_path / 'contacts.json'
+    journal = tmp_path / 'contacts.json.journal'
+    for name in ['Ada', 'Bob', 'Cy']:
+        code, out, err = run_cli(['--db', str(db), '--journal', 'add', '--name', name, '--phone', '1'])
+        assert code == 0
+    run_cli(['--db', str(db), '--journal', 'delete', '--id', '2'])
+    assert not db.exists()
+    assert len(journal.read_text().splitlines()) == 4
+
+    code, out, err = run_cli(['--db', str(db), 'list'])
+    assert 'Ada' in out and 'Cy' in out and 'Bob' not in out
+
+    code, out, err = run_cli(['--db', str(db), 'compact'])
+    assert code == 0 and 'Compacted 4' in out
+    assert journal.read_text() == ''
+    data = json.loads(db.read_text())
+    assert [c['name'] for c in data['contacts']] == ['Ada', 'Cy'] and data['next_id'] == 4
+
+
+def test_journal_replay_skips_folded_records_and_torn_tail(tmp_path):
+    path = str(tmp_path / 'contacts.json')
+    db = mod.load_db(path, journal=True)
+    mod.add_contact(db, name='Ada', phone='1')
+    mod.save_db(path, db)
+    # Snapshot written but journal not yet truncated (crash during compact)
+    db['journal_seq'] = db['_journal'].seq
+    mod._write_snapshot(path, db)
+    with open(path + '.journal', 'a') as f:
+        f.write('{"op": "add", "contact": {"id": 9')  # torn append
+
+    db = mod.load_db(path, journal=True)
+    assert [c['name'] for c in db['contacts'].values()] == ['Ada']
+    mod.add_contact(db, name='Bob', phone='2')
+    mod.save_db(path, db)
+    assert [c['name'] for c in mod.load_db(path)['contacts'].values()] == ['Ada', 'Bob']
+
+
+def test_contactbook_replays_journal_and_keeps_seq(tmp_path, book_mod):
+    path = str(tmp_path / 'c.json')
+    db = mod.load_db(path)
+    mod.add_contact(db, 'A', '1')
+    mod.save_db(path, db)
+    db = mod.load_db(path, journal=True)
+    mod.add_contact(db, 'B', '2')
+    mod.delete_contact(db, 1)
+    mod.save_db(path, db)
+    db['_journal'].close()
+
+    book = book_mod.ContactBook(path)
+    assert [c.name for c in book.list_contacts('id')] == ['B'] and book.next_id == 3
+    assert book.add_contact('C', '3', '', []) == 3
+    saved = json.loads(Path(path).read_text())
+    assert saved['next_id'] == 4 and saved['journal_seq'] == 2
+    # The journal is not applied a second time on top of ContactBook's save
+    assert [(c['id'], c['name']) for c in mod.list_contacts(mod.load_db(path), 'id')] == [(2, 'B'), (3, 'C')]
+
+
+def test_binary_snapshot_roundtrip_and_lazy_access(tmp_path):
+    db = tmp_path / 'contacts.db'
+    for name, tags in [('Ada', ['math']), ('Bob', ['sales', 'math']), ('Cy', [])]:
+        run_cli(['--db', str(db), 'add', '--name', name, '--phone', '1', '--tags', *tags])
+    before = json.loads(db.read_text())
+    code, out, err = run_cli(['--db', str(db), 'snapshot'])
+    assert code == 0 and 'binary snapshot of 3 contact(s)' in out
+    assert mod.is_snapshot(db)
+
+    loaded = mod.load_db(str(db))
+    assert mod.get_contact(loaded, 2) == before['contacts'][1]
+    assert list(loaded['contacts']._cache) == [2]  # only the requested record was decoded
+    assert run_cli(['--db', str(db), 'delete', '--id', '1'])[0] == 0
+    assert run_cli(['--db', str(db), 'add', '--name', 'Dee', '--phone', '2', '--tags', 'math'])[0] == 0
+    assert mod.is_snapshot(db)  # saved back in the same format
+    code, out, err = run_cli(['--db', str(db), 'list'])
+    assert 'Ada' not in out and 'Bob' in out and 'Dee' in out
+
+    code, out, err = run_cli(['--db', str(db), 'snapshot', '--format', 'json'])
+    assert code == 0
+    data = json.loads(db.read_text())
+    assert data['next_id'] == 5 and [c['name'] for c in data['contacts']] == ['Bob', 'Cy', 'Dee']
+    assert data['contacts'][0] == before['contacts'][1]
+
+
+def test_contactbook_reads_and_writes_binary_snapshot(tmp_path, book_mod):
+    path = tmp_path / 'book.db'
+    db = {"next_id": 1, "contacts": []}
+    mod.add_contact(db, 'Ada', '1', 'a@x', ['vip'])
+    mod.write_snapshot(str(path), db)
+    book = book_mod.ContactBook(str(path))
+    book.add_contact('Bob', '2', 'b@x', [])
+    assert mod.is_snapshot(path)
+    assert [c.name for c in book_mod.ContactBook(str(path)).list_contacts('id')] == ['Ada', 'Bob']
+
+    lazy = book_mod.ContactBook(str(path))
+    assert lazy.delete_contact(1) and not lazy.contacts._cache  # nothing decoded up front
+    lazy.close()
+    assert lazy.contacts.mm.closed
+    assert [c.name for c in book_mod.ContactBook(str(path)).list_contacts('name')] == ['Bob']
+
+    with mod.SnapshotContacts(str(path)) as snap:
+        assert [c.name for c in snap.values()] == ['Bob']
+    assert snap.mm.closed
+    with pytest.raises(ValueError):
+        mod.encode_snapshot({"next_id": 2, "contacts": {1: mod.Contact(1, 'T', '1', '', ['t'] * 70000)}})
+
+
+def test_shared_concurrent_writers_lose_nothing(tmp_path):
+    if mod.fcntl is None:
+        pytest.skip('--shared needs fcntl')
+    db = tmp_path / 'contacts.json'
+    run_cli(['--db', str(db), 'add', '--name', 'Seed', '--phone', '0'])
+    n = 32
+    procs = [subprocess.Popen([sys.executable, 'day-02/contacts.py', '--db', str(db), '--shared',
+                               'add', '--name', f'Writer {i}', '--phone', str(i)],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+             for i in range(n)]
+    procs.append(subprocess.Popen([sys.executable, 'day-02/contacts.py', '--db', str(db), '--shared',
+                                   'delete', '--id', '1'], stdout=subprocess.PIPE, text=True))
+    outs = [p.communicate()[0] for p in procs]
+    assert all(p.returncode == 0 for p in procs)
+    ids = [int(o.split('#')[1].split(':')[0]) for o in outs[:n]]
+    assert sorted(ids) == list(range(2, n + 2))  # no collisions, none lost
+
+    data = json.loads(db.read_text())
+    assert sorted(c['name'] for c in data['contacts']) == sorted(f'Writer {i}' for i in range(n))
+    assert data['next_id'] == n + 2
+    assert not list((tmp_path / 'contacts.json.spool').iterdir())
+
+    # Plain writers are serialized by the default lock: slower, but nothing is lost
+    procs = [subprocess.Popen([sys.executable, 'day-02/contacts.py', '--db', str(db),
+                               'add', '--name', f'Cron {i}', '--phone', str(i)], stdout=subprocess.PIPE)
+             for i in range(8)]
+    assert all(p.wait() == 0 for p in procs)
+    assert len(json.loads(db.read_text())['contacts']) == n + 8
+
+
+def test_group_commit_survives_leader_crash_and_failed_save(tmp_path, monkeypatch):
+    import os
+    if mod.fcntl is None:
+        pytest.skip('--shared needs fcntl')
+    db = str(tmp_path / 'contacts.json')
+    spool = mod._spool_path(db)
+    spool.mkdir()
+    (spool / '1-1.op').write_text(json.dumps({"op": "add", "name": "Ada", "phone": "1"}))
+
+    def crash_after_save(sp, results):
+        raise KeyboardInterrupt  # the leader dies before handing out its results
+
+    monkeypatch.setattr(mod, '_hand_out', crash_after_save)
+    with pytest.raises(KeyboardInterrupt):
+        mod._drain_spool(db)
+    monkeypatch.undo()
+    # The next leader hands out the saved results instead of adding Ada twice
+    assert mod.submit_op(db, {"op": "add", "name": "Bob", "phone": "2"})['contact']['id'] == 2
+    assert json.loads((spool / '1-1.done').read_text())['contact']['id'] == 1
+    assert [c['name'] for c in json.loads(Path(db).read_text())['contacts']] == ['Ada', 'Bob']
+    assert not (spool / 'batch.json').exists()
+
+    # A failed save is reported to every submitter of the batch
+    (spool / '2-2.op').write_text(json.dumps({"op": "delete", "id": 1}))
+    monkeypatch.setattr(mod, 'compact_db', lambda path, d: (_ for _ in ()).throw(OSError('disk full')))
+    with pytest.raises(OSError):
+        mod.submit_op(db, {"op": "delete", "id": 2})
+    assert 'disk full' in json.loads((spool / '2-2.done').read_text())['error']
+    monkeypatch.undo()
+
+    # A leader killed before its save leaves batch.json: the ops are applied
+    # by the next leader, once
+    (spool / '3-3.op').write_text(json.dumps({"op": "add", "name": "Cy", "phone": "3"}))
+    monkeypatch.setattr(mod, 'compact_db', lambda path, d: (_ for _ in ()).throw(KeyboardInterrupt))
+    with pytest.raises(KeyboardInterrupt):
+        mod._drain_spool(db)
+    monkeypatch.undo()
+    assert (spool / 'batch.json').exists()
+    dee = mod.submit_op(db, {"op": "add", "name": "Dee", "phone": "4"})['contact']['id']
+    assert {dee, json.loads((spool / '3-3.done').read_text())['contact']['id']} == {3, 4}
+
+    # .done files of killed submitters are swept
+    for name in ('1-1', '2-2', '3-3'):
+        os.utime(spool / (name + '.done'), (0, 0))
+    mod.submit_op(db, {"op": "delete", "id": 2})
+    assert not list(spool.iterdir())
+    # Group commit leaves nothing of its own in the DB
+    saved = json.loads(Path(db).read_text())
+    assert set(saved) == {'next_id', 'contacts'} and sorted(c['name'] for c in saved['contacts']) == ['Ada', 'Cy', 'Dee']
+
+
+def test_sharded_layout_rewrites_only_touched_shard(tmp_path):
+    db = tmp_path / 'contacts.json'
+    for i in range(10):
+        run_cli(['--db', str(db), 'add', '--name', f'N{i}', '--phone', str(i)])
+    code, out, err = run_cli(['--db', str(db), 'shard', '--count', '4'])
+    assert code == 0 and 'Sharded 10 contact(s) into 4 shard(s)' in out
+    manifest = json.loads(db.read_text())
+    assert manifest['shards'] == 4 and manifest['next_id'] == 11 and sum(manifest['counts']) == 10
+    shard_dir = tmp_path / manifest['dir']
+    before = {f.name: f.read_text() for f in shard_dir.iterdir()}
+
+    assert run_cli(['--db', str(db), 'add', '--name', 'New', '--phone', '11'])[0] == 0  # id 11 -> shard 3
+    assert run_cli(['--db', str(db), 'delete', '--id', '7'])[0] == 0  # shard 3 as well
+    after = {f.name: f.read_text() for f in shard_dir.iterdir()}
+    assert [n for n in after if after[n] != before[n]] == ['shard-0003.json']
+
+    loaded = mod.load_db(str(db))
+    assert mod.get_contact(loaded, 6)['name'] == 'N5'
+    assert loaded['contacts'].shards.count(None) == 3  # only shard 2 was read
+    assert [c['id'] for c in mod.list_contacts(loaded, 'id')] == [1, 2, 3, 4, 5, 6, 8, 9, 10, 11]
+
+    code, out, err = run_cli(['--db', str(db), 'snapshot', '--format', 'json'])
+    assert code == 0 and [c['id'] for c in json.loads(db.read_text())['contacts']] == [1, 2, 3, 4, 5, 6, 8, 9, 10, 11]
+    assert not shard_dir.exists()
+
+
+def test_contactbook_opens_sharded_db(tmp_path, book_mod):
+    path = str(tmp_path / 'c.json')
+    db = {"next_id": 1, "contacts": []}
+    for i in range(10):
+        mod.add_contact(db, f'N{i}', str(i))
+    mod.delete_contact(db, 10)
+    mod.shard_db(path, db, 3)
+
+    book = book_mod.ContactBook(path)
+    assert len(book.contacts) == 9 and book.next_id == 11
+    assert book.add_contact('New', '11', '', []) == 11  # id 10 is not handed out again
+    with pytest.raises(RuntimeError):
+        with book.batch():
+            book.delete_contact(4)
+            raise RuntimeError('boom')
+    assert [c.id for c in book.list_contacts('id')] == [1, 2, 3, 4, 5, 6, 7, 8, 9, 11]
+    assert book.delete_contact(1)
+
+    loaded = mod.load_db(path)
+    assert "shards" in json.loads(Path(path).read_text())
+    assert [c['id'] for c in mod.list_contacts(loaded, 'id')] == [2, 3, 4, 5, 6, 7, 8, 9, 11]
+    assert loaded['next_id'] == 12
+
+
+def test_reshard_crash_keeps_old_book(tmp_path, monkeypatch):
+    db = {"next_id": 1, "contacts": []}
+    for i in range(20):
+        mod.add_contact(db, f'N{i}', str(i))
+    path = tmp_path / 'c.json'
+    mod.shard_db(str(path), db, 4)
+    real_write = mod._atomic_write
+
+    def crash_on_manifest(p, data):
+        if p == path:
+            raise KeyboardInterrupt('crash')
+        real_write(p, data)
+
+    monkeypatch.setattr(mod, '_atomic_write', crash_on_manifest)
+    with pytest.raises(KeyboardInterrupt):
+        mod.shard_db(str(path), mod.load_db(str(path)), 3)
+    monkeypatch.undo()
+    assert len(list(mod.load_db(str(path))['contacts'].values())) == 20
+
+    # A missing shard the manifest says is non-empty is an error, not an empty shard
+    manifest = json.loads(path.read_text())
+    (tmp_path / manifest['dir'] / 'shard-0001.json').unlink()
+    with pytest.raises(FileNotFoundError):
+        list(mod.load_db(str(path))['contacts'].values())
+
+
+def test_sharded_parallel_load(tmp_path, monkeypatch):
+    # Pool workers unpickle _read_shard by module name
+    monkeypatch.setitem(sys.modules, 'contacts', mod)
+    monkeypatch.syspath_prepend('day-02')
+    db = {"next_id": 1, "contacts": []}
+    for i in range(50):
+        mod.add_contact(db, f'N{i}', str(i), tags=['t'])
+    path = str(tmp_path / 'c.json')
+    mod.shard_db(path, db, 5)
+    loaded = mod.load_db(path, workers=3)
+    assert list(loaded['contacts'].values()) == list(db['contacts'].values())
+    mod.shard_db(path, loaded, 2)  # re-shard replaces the old directory
+    assert len([d for d in tmp_path.iterdir() if d.is_dir()]) == 1
+    assert len(mod.load_db(path)['contacts']) == 50
+
+
+def test_sqlite_backend_cli(tmp_path):
+    db = 'sqlite:' + str(tmp_path / 'contacts.db')
+    code, out, err = run_cli(['--db', db, 'add', '--name', 'Alice', '--phone', '111', '--tags', 'sales'])
+    assert code == 0 and 'Added contact #1' in out
+    run_cli(['--db', db, 'add', '--name', 'Alicia', '--phone', '222'])
+    run_cli(['--db', db, 'add', '--name', 'Charlie', '--phone', '333'])
+
+    code, out, err = run_cli(['--db', db, 'find', '--q', 'lic'])
+    assert code == 0 and 'Alice' in out and 'Alicia' in out and 'Charlie' not in out
+
+    code, out, err = run_cli(['--db', db, 'delete', '--id', '2'])
+    assert code == 0 and 'Deleted contact id 2' in out
+    code, out, err = run_cli(['--db', db, 'delete', '--id', '2'])
+    assert code == 1 and 'not found' in err
+
+    code, out, err = run_cli(['--db', db, 'add', '--name', 'Dee', '--phone', '4'])
+    assert 'Added contact #4' in out  # ids are never reused
+    code, out, err = run_cli(['--db', db, 'add', '--name', '', '--phone', '4'])
+    assert code == 2
+
+
+def test_sqlite_find_matches_json_semantics():
+    store = mod.SqliteStore(':memory:')
+    db = {"next_id": 1, "contacts": []}
+    for name, phone, email, tags in [('Ada Lovelace', '+44 1234', 'ada@example.com', ['math']),
+                                     ('Bob', '456', '', ['sales', 'apac']),
+                                     ('Zoë "Z"', '789', 'z@example.com', []),
+                                     ('ada', '1', '', [])]:
+        store.add_contact(name, phone, email, tags)
+        mod.add_contact(db, name, phone, email, tags)
+    for q in ['a', 'ad', 'A LO', 'les ap', '"z"', '@example', 'zoë', 'nope']:
+        assert list(store.find_contacts(q)) == mod.find_contacts(db, q), q
+    for sort_by in ['name', 'id']:
+        for reverse in [False, True]:
+            assert list(store.list_contacts(sort_by, reverse)) == mod.list_contacts(db, sort_by, reverse)
+    plan = store.conn.execute("EXPLAIN QUERY PLAN SELECT id FROM contacts ORDER BY name COLLATE NOCASE, id").fetchall()
+    assert 'contacts_name_nocase' in plan[0][-1]  # streamed in index order, no sort
+
+
+def test_import_export_roundtrip(tmp_path):
+    db = tmp_path / 'contacts.json'
+    src = tmp_path / 'in.csv'
+    src.write_text('name,phone,email,tags\nAda,1,a@x.com,math;pioneer\n,2,,\nBob,3,,\n')
+
+    code, out, err = run_cli(['--db', str(db), 'import', '--file', str(src)])
+    assert code == 2  # one bad row, reported but not fatal
+    assert 'Imported 2 contact(s), 1 error(s)' in out and 'line 3' in err
+
+    dst = tmp_path / 'out.jsonl'
+    code, out, err = run_cli(['--db', str(db), 'export', '--file', str(dst)])
+    assert code == 0
+    rows = [json.loads(line) for line in dst.read_text().splitlines()]
+    assert rows[0] == {"id": 1, "name": "Ada", "phone": "1", "email": "a@x.com", "tags": ["math", "pioneer"]}
+    assert [r['name'] for r in rows] == ['Ada', 'Bob']
+
+
+def test_import_persists_in_batches():
+    import io
+    db = {"next_id": 1, "contacts": []}
+    flushes = []
+    lines = ''.join(json.dumps({"name": f"N{i}", "phone": str(i)}) + '\n' for i in range(10))
+    added = mod.import_contacts(db, mod.read_records(io.StringIO(lines), 'jsonl'),
+                                batch_size=4, flush=lambda: flushes.append(len(db['contacts'])))
+    assert added == 10 and flushes == [4, 8]
+
+
+def test_import_rejects_non_string_fields():
+    import io
+    db = {"next_id": 1, "contacts": []}
+    errors = []
+    lines = (json.dumps({"name": "Ada", "phone": "1", "email": 5}) + '\n'
+             + json.dumps({"name": 7, "phone": "2"}) + '\n'
+             + json.dumps({"name": "Bob", "phone": "3"}) + '\n')
+    added = mod.import_contacts(db, mod.read_records(io.StringIO(lines), 'jsonl'),
+                                on_error=lambda n, msg: errors.append((n, msg)))
+    assert added == 1 and [c['name'] for c in mod.list_contacts(db)] == ['Bob']
+    assert errors == [(1, "'email' must be a string."), (2, "'name' must be a string.")]
+
+
+def test_list_pagination_matches_full_sort():
+    db = {"next_id": 1, "contacts": []}
+    for name in ['Eve', 'Bob', 'Ada', 'Dan', 'Bob', 'Cy']:
+        mod.add_contact(db, name=name, phone='1')
+    for reverse in [False, True]:
+        full = mod.list_contacts(db, 'name', reverse)
+        assert mod.list_contacts(db, 'name', reverse, limit=3, offset=1) == full[1:4]
+        assert mod.list_contacts(db, 'name', reverse, offset=4) == full[4:]
+
+
+def test_sorted_indexes_stay_in_order_across_add_and_delete(book_mod):
+    import random
+    rng = random.Random(3)
+    db = {"next_id": 1, "contacts": []}
+    mod.list_contacts(db)  # build the indexes first, then mutate
+    mod.list_contacts(db, 'id')
+    for i in range(300):
+        mod.add_contact(db, name=rng.choice(['ada', 'Ada', 'bob', 'Cy', 'dan']) + str(rng.randint(0, 3)), phone='1')
+        if i % 4 == 3:
+            mod.delete_contact(db, rng.randint(1, i))
+    values = list(db['contacts'].values())
+    for key in ['name', 'id']:
+        for reverse in [False, True]:
+            expected = sorted(values, key=lambda c: c[key].casefold() if key == 'name' else c[key],
+                              reverse=reverse)
+            assert mod.list_contacts(db, key, reverse) == expected
+            assert mod.list_contacts(db, key, reverse, limit=7, offset=20) == expected[20:27]
+    assert mod.name_range(db, 'A', 'b') == [c for c in mod.list_contacts(db) if 'a' <= c['name'].casefold() < 'b']
+
+    book = book_mod.ContactBook()
+    for name in ['bob', 'Ada', 'cy', 'ada', 'Bea']:
+        book.add_contact(name, '1', '', [])
+    book.delete_contact(1)
+    assert list(book.contacts) == [2, 3, 4, 5]  # keyed by id
+    assert [c.name for c in book.list_contacts('name')] == ['Ada', 'ada', 'Bea', 'cy']
+    assert [c.name for c in book.top_by_name(2)] == ['Ada', 'ada']
+    assert [c.name for c in book.name_range('B', 'C')] == ['Bea']
+
+
+def test_lookup_phone_ignores_formatting():
+    db = {"next_id": 1, "contacts": []}
+    for phone in ['+1 (555) 123-4567', '555-123-4567', '+44 20 7946 0958', '1555 999 0000']:
+        mod.add_contact(db, name=f'P{phone}', phone=phone)
+    assert [c['id'] for c in mod.lookup_phone(db, '+1 555-12')] == [1, 2]
+    assert [c['id'] for c in mod.lookup_phone(db, '555')] == [1, 2, 4]
+    assert [c['id'] for c in mod.lookup_phone(db, '(123) 4567', 'suffix')] == [1, 2]
+    assert [c['id'] for c in mod.lookup_phone(db, '1 555 123 4567', 'exact')] == [1, 2]
+    assert [c['id'] for c in mod.lookup_phone(db, '020 7946')] == [3]
+    mod.delete_contact(db, 1)
+    mod.add_contact(db, name='New', phone='0958')
+    assert [c['id'] for c in mod.lookup_phone(db, '958', 'suffix')] == [5, 3]
+    assert mod.lookup_phone(db, '555 999') == [mod.get_contact(db, 4)]
+
+
+def test_lookup_phone_drops_country_code():
+    # The telephony case: incoming numbers carry a country code, saved ones may not
+    db = {"next_id": 1, "contacts": []}
+    mod.add_contact(db, name='Ada', phone='+1 (555) 123-4567')
+    mod.add_contact(db, name='Bob', phone='5551234')
+    assert [c['name'] for c in mod.lookup_phone(db, '+1 (555) 123')] == ['Bob', 'Ada']
+    assert [c['name'] for c in mod.lookup_phone(db, '5551234')] == ['Bob', 'Ada']
+    assert [c['name'] for c in mod.lookup_phone(db, '+1 555 1234', 'exact')] == ['Bob']
+    assert [c['name'] for c in mod.lookup_phone(db, '0015551234567', 'suffix')] == ['Ada']
+    assert mod.normalize_phone('+44 20 7946 0958') == mod.normalize_phone('020 7946 0958') == '2079460958'
+
+
+def test_cli_lookup(tmp_path):
+    for db in (str(tmp_path / 'contacts.json'), 'sqlite:' + str(tmp_path / 'contacts.db')):
+        run_cli(['--db', db, 'add', '--name', 'Ada', '--phone', '+1 (555) 123-4567'])
+        code, out, err = run_cli(['--db', db, 'lookup', '--phone', '555.123.4567', '--match', 'suffix'])
+        assert code == 0 and 'Ada' in out
+        code, out, err = run_cli(['--db', db, 'lookup', '--phone', '556'])
+        assert code == 0 and 'No contacts found.' in out
+        code, out, err = run_cli(['--db', db, 'lookup', '--phone', 'abc'])
+        assert code == 2 and 'digit' in err
+
+
+def test_write_table_streams_after_sample():
+    import io
+    rows = [{"id": i, "name": 'x' * i, "phone": '1', "email": '', "tags": []} for i in range(1, 6)]
+    buf = io.StringIO()
+    assert mod._write_table(iter(rows), buf, sample=2) == 5
+    lines = buf.getvalue().splitlines()
+    assert lines[0].startswith('ID | Name | Phone')  # widths from the first 2 rows only
+    assert lines[6].startswith('5  | xxxxx | 1')
+    assert lines[-1] == 'Total: 5'
+    # Small tables render exactly as before
+    assert mod._fmt_table(rows[:1]).splitlines()[2] == '1  | x    | 1     |       |     '
+
+
+def test_cli_list_limit_offset(tmp_path):
+    db = tmp_path / 'contacts.json'
+    for name in ['Cy', 'Ada', 'Bob']:
+        run_cli(['--db', str(db), 'add', '--name', name, '--phone', '1'])
+    code, out, err = run_cli(['--db', str(db), 'list', '--limit', '1', '--offset', '1'])
+    assert code == 0 and 'Bob' in out and 'Ada' not in out and 'Cy' not in out and 'Total: 1' in out
+
+
+def test_find_and_merge_duplicates():
+    db = {"next_id": 1, "contacts": []}
+    mod.build_search_index(db)
+    mod.add_contact(db, name='Ada Lovelace', phone='+1 (555) 123-4567', tags=['math'])
+    mod.add_contact(db, name='Bob', phone='555-0000', email='bob@example.com')
+    mod.add_contact(db, name='lovelace ada', phone='555.123.4567', email='ada@example.com', tags=['vip', 'math'])
+    mod.add_contact(db, name='Robert', phone='+44 20 7946 0958', email='BOB@example.com ')
+    mod.add_contact(db, name='Charles', phone='555-123-4567')  # shared line, different name
+    mod.add_contact(db, name='Ada L.', phone='12', email='ada@example.com')
+    assert [c['name'] for c in mod.list_contacts(db)][:2] == ['Ada L.', 'Ada Lovelace']
+
+    clusters = mod.find_duplicates(db)
+    assert [[c['id'] for c in cl] for cl in clusters] == [[1, 3, 6], [2, 4]]
+    assert mod.merge_duplicates(db, clusters) == 3
+    assert [c['id'] for c in mod.list_contacts(db, sort_by='id')] == [1, 2, 5]
+    ada = mod.get_contact(db, 1)
+    assert ada['email'] == 'ada@example.com' and list(ada['tags']) == ['math', 'vip']
+    assert [c['id'] for c in mod.find_contacts(db, 'vip')] == [1]
+    assert [c['id'] for c in mod.list_contacts(db)] == [1, 2, 5]
+    assert mod.find_duplicates(db) == []
+
+
+def test_cli_dedupe(tmp_path):
+    db = tmp_path / 'contacts.json'
+    run_cli(['--db', str(db), '--journal', 'add', '--name', 'Ada', '--phone', '555 123 4567'])
+    run_cli(['--db', str(db), '--journal', 'add', '--name', 'ada', '--phone', '5551234567', '--tags', 'vip'])
+    code, out, err = run_cli(['--db', str(db), 'dedupe'])
+    assert code == 0 and '#1 Ada: duplicates #2' in out
+    code, out, err = run_cli(['--db', str(db), '--journal', 'dedupe', '--merge'])
+    assert code == 0 and 'Merged 1 duplicate(s) into 1 contact(s)' in out
+    code, out, err = run_cli(['--db', str(db), 'get', '--id', '1'])
+    assert 'vip' in out
+    code, out, err = run_cli(['--db', str(db), 'dedupe'])
+    assert code == 0 and 'No duplicates found.' in out
+
+    db = 'sqlite:' + str(tmp_path / 'contacts.db')
+    run_cli(['--db', db, 'add', '--name', 'Ada', '--phone', '555 123 4567'])
+    run_cli(['--db', db, 'add', '--name', 'ada', '--phone', '5551234567', '--tags', 'vip'])
+    code, out, err = run_cli(['--db', db, 'dedupe', '--merge'])
+    assert code == 0 and 'Merged 1 duplicate(s) into 1 contact(s)' in out
+    code, out, err = run_cli(['--db', db, 'find', '--q', 'vip'])
+    assert 'Ada' in out and 'Total: 1' in out
+
+
+def test_sqlite_lookup_and_dedupe_match_json():
+    db = {"next_id": 1, "contacts": []}
+    store = mod.SqliteStore(':memory:')
+    rows = [('Ada Lovelace', '+1 (555) 123-4567', None, ['math']),
+            ('Bob', '555-0000', 'bob@example.com', []),
+            ('lovelace ada', '555.123.4567', 'ada@example.com', ['vip', 'math']),
+            ('Robert', '+44 20 7946 0958', 'BOB@example.com ', []),
+            ('Charles', '555-123-4567', None, []),
+            ('Ada L.', '12', 'ada@example.com', [])]
+    for name, phone, email, tags in rows:
+        mod.add_contact(db, name, phone, email, tags)
+        store.add_contact(name, phone, email, tags)
+
+    def ids(contacts):
+        return [c['id'] for c in contacts]
+    for phone, match in [('555', 'prefix'), ('4567', 'suffix'), ('+1 555 123 4567', 'exact'), ('1', 'prefix'),
+                         ('020 7946 0958', 'exact'), ('99', 'suffix')]:
+        assert ids(mod.lookup_phone(store, phone, match)) == ids(mod.lookup_phone(db, phone, match)), (phone, match)
+    clusters = mod.find_duplicates(store)
+    assert [ids(cl) for cl in clusters] == [ids(cl) for cl in mod.find_duplicates(db)] == [[1, 3, 6], [2, 4]]
+    assert mod.merge_duplicates(store, clusters) == 3
+    assert ids(store.list_contacts('id')) == [1, 2, 5]
+    ada = store.get_contact(1)
+    assert ada['email'] == 'ada@example.com' and list(ada['tags']) == ['math', 'vip']
+    assert ids(store.find_contacts('vip')) == [1] and mod.find_duplicates(store) == []
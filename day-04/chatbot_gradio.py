@@ -1,16 +1,47 @@
 import os
+from http.cookiejar import DefaultCookiePolicy
+
 import gradio as gr
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 load_dotenv()
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
+PERPLEXITY_URL = os.getenv("PERPLEXITY_URL", "https://api.perplexity.ai/chat/completions")
+
+# Connection pool shared by every chat session (override via .env)
+POOL_SIZE = int(os.getenv("PERPLEXITY_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.getenv("PERPLEXITY_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("PERPLEXITY_READ_TIMEOUT", "60"))
+
+
+def make_session(pool_size=POOL_SIZE):
+    """Session whose keep-alive connections are reused across requests and threads.
+
+    pool_block makes extra concurrent requests wait for a free connection
+    instead of opening (and then discarding) one more. The session is shared
+    by every user, so its cookie jar accepts nothing: a cookie set on one
+    user's reply would otherwise be sent with everyone's requests.
+    """
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Created once at startup and used from Gradio's worker threads. Shared state
+# is the urllib3 pool (thread-safe) and a cookie jar that stores nothing;
+# every per-user value (history, headers, body) is passed per request
+session = make_session()
+
 
 def chat_perplexity(user_message, history=[]):
     if not isinstance(history, list):
         history = []
 
-    url = "https://api.perplexity.ai/chat/completions"
     headers = {
         "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
         "Content-Type": "application/json"
@@ -31,7 +62,8 @@ def chat_perplexity(user_message, history=[]):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = session.post(PERPLEXITY_URL, headers=headers, json=data,
+                                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
         response.raise_for_status()
         result = response.json()
         reply = result["choices"][0]["message"]["content"]
@@ -49,6 +81,9 @@ with chatbot_ui:
     msg_box = gr.Textbox(label="Your message")
     state = gr.State()
     send_btn = gr.Button("Send")
-    send_btn.click(chat_perplexity, inputs=[msg_box, state], outputs=[chatbot, state])
+    # Let as many sessions run at once as the pool has connections
+    send_btn.click(chat_perplexity, inputs=[msg_box, state], outputs=[chatbot, state],
+                   concurrency_limit=POOL_SIZE)
 
-chatbot_ui.launch()
\ No newline at end of file
+if __name__ == "__main__":
+    chatbot_ui.launch()
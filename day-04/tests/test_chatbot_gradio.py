@@ -0,0 +1,78 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from day_01_import_helper import import_from_path
+
+pytest.importorskip('requests')
+pytest.importorskip('gradio')
+pytest.importorskip('dotenv')
+
+mod = import_from_path('chatbot_gradio', 'day-04/chatbot_gradio.py')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open between requests
+    protocol_version = 'HTTP/1.1'
+    peers = []
+    cookies = []
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.peers.append(self.client_address)
+        self.cookies.append(self.headers.get('Cookie'))
+        body = json.dumps({"choices": [{"message": {"content": f"echo: {data['messages'][-1]['content']}"}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Set-Cookie', f"user={data['messages'][-1]['content']}; Path=/")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    StubHandler.peers = []
+    StubHandler.cookies = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(mod, 'PERPLEXITY_URL', f'http://127.0.0.1:{server.server_port}/chat/completions')
+    monkeypatch.setattr(mod, 'session', mod.make_session(pool_size=2))
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+def test_chat_reuses_pooled_connection(stub_url):
+    history = []
+    for msg in ['hi', 'again', 'bye']:
+        history, _ = mod.chat_perplexity(msg, history)
+    assert [reply for _, reply in history] == ['echo: hi', 'echo: again', 'echo: bye']
+    # Every request arrived over the same TCP connection (same client port)
+    assert len(StubHandler.peers) == 3
+    assert len(set(StubHandler.peers)) == 1
+
+
+def test_concurrent_sessions_share_bounded_pool(stub_url):
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(mod.chat_perplexity(f'm{i}', [])[0]))
+               for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(h[0][1] for h in results) == sorted(f'echo: m{i}' for i in range(8))
+    # No more connections than the pool allows
+    assert len(set(StubHandler.peers)) <= 2
+
+
+def test_cookies_are_not_shared_between_users(stub_url):
+    mod.chat_perplexity('alice', [])
+    mod.chat_perplexity('bob', [])
+    # The pooled session never stores or sends back a cookie from a reply
+    assert StubHandler.cookies == [None, None]
+    assert len(mod.session.cookies) == 0